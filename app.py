@@ -1,37 +1,48 @@
 import dash
-from dash import dcc, html
+from dash import dcc, html, callback_context, no_update
 import dash_bootstrap_components as dbc
-from dash.dependencies import Input, Output
-import pandas as pd
+from dash.dependencies import Input, Output, State
+from dash.exceptions import PreventUpdate
+from flask import Response, jsonify, redirect, request
 from flask_caching import Cache
-from io import StringIO
-import plotly.express as px
 import plotly.graph_objects as go
+from plotly.utils import PlotlyJSONEncoder
+import hashlib
+import io
+import json
 import os
+import time
+from urllib.parse import urlencode
+from datastore import get_store, evaluate, filter_key, ResultCache, Cube, summarize
+import metrics
 
 # Initialisation de l'application
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP], suppress_callback_exceptions=True)
+server = app.server  # Point d'entrée WSGI : gunicorn -c gunicorn.conf.py app:server
 port = int(os.environ.get("PORT", 8080))
+metrics.instrument(app)  # Durées et tailles des réponses de chaque callback, exposées sur /metrics
 
-# Configuration du cache
-cache = Cache(app.server, config={'CACHE_TYPE': 'filesystem', 'CACHE_DIR': 'cache-directory'})
-TIMEOUT = None  # Cache permanent jusqu'à redémarrage de l'app
+# Configuration du cache (partagé entre workers, borné en nombre de fichiers)
+cache = Cache(app.server, config={'CACHE_TYPE': 'filesystem', 'CACHE_DIR': os.environ.get("STARTHUB_CACHE_DIR", 'cache-directory'), 'CACHE_THRESHOLD': 1000})
 
-# Chargement des csv
-@cache.memoize(timeout=TIMEOUT)
-def query_all_data():
-    files = ["societes.csv", "financements.csv", "personnes.csv"]  # Liste des fichiers à charger
-    dataframes = {}
+# Cache des résultats du dashboard : LRU local au worker, puis cache partagé
+results = ResultCache(backend=cache)
 
-    for file in files:
-        df = pd.read_csv(f'assets/{file}')
-        dataframes[file] = df.to_json(date_format='iso', orient='split')  # Stockage JSON
-    return dataframes  # Retourne un dictionnaire JSON
+# Chargement des csv : tables typées chargées une seule fois par worker, sans passage par JSON
+@metrics.timed("load")
+def query_all_data():
+    return get_store().tables()  # Retourne un dictionnaire de DataFrames
 
+@metrics.timed("load")
 def get_dataframe(filename):
-    dataframes = query_all_data()  # Récupère tous les datasets en cache
-    json_string = dataframes[filename]  # Récupère la chaîne JSON
-    return pd.read_json(StringIO(json_string), orient='split')  # Convertit en DataFrame en utilisant StringIO pour le FutureWarning
+    return get_store().table(filename)  # Vue en lecture seule sur la table du store, sans copie
+
+def search_options(column, search_value=None, selected=None):
+    # Options d'une liste déroulante : valeurs sélectionnées puis meilleures correspondances de la saisie.
+    # La liste filtre aussi côté navigateur : "search" garantit que les options renvoyées y restent visibles
+    selected = [selected] if isinstance(selected, str) else list(selected or [])
+    labels = dict.fromkeys(selected + get_store().search_index(column).search(search_value))
+    return [{"label": label, "value": label, "search": f"{label} {search_value or ''}"} for label in labels]
 
 from pages import home, projet, dashboard2, map, equipe, amelioration  # Importer les pages
 
@@ -57,387 +68,120 @@ app.layout = html.Div([
     html.Div(id='page-content')  # Contenu de la page à changer en fonction de l'URL
 ])
 
+# Pages : les données et imports lourds de chaque page sont chargés à sa première visite
+PAGES = {
+    '/dashboard2': dashboard2,
+    '/projet': projet,
+    '/equipe': equipe,
+    '/amelioration': amelioration,
+    '/map': map,
+}
+
+def page_layout(page):
+    # Les pages qui dépendent des données exposent leur layout sous forme de fonction
+    return page.layout() if callable(page.layout) else page.layout
+
 # Callback pour changer de page en fonction de l'URL
 @app.callback(
     Output('page-content', 'children'),
     [Input('url', 'pathname')]
 )
 def display_page(pathname):
-    if pathname == '/dashboard2':
-        return dashboard2.layout
-    elif pathname == '/projet':
-        return projet.layout
-    elif pathname == '/equipe':
-        return equipe.layout
-    elif pathname == '/amelioration':
-        return amelioration.layout
-    elif pathname == '/map':
-        return map.layout
-    else:
-        return home.layout
+    return page_layout(PAGES.get(pathname, home))
 
-# Callbacks pour les filtres et les graphiques
+# Catégories recherchées côté serveur (liste commune au dashboard et à la carte)
 @app.callback(
-    Output("mean-funding", "children"),
-    [
-        Input('keyword-dropdown', 'value'),  # Remplacez 'sector-filter' par 'keyword-dropdown'
-        Input('year-filter', 'value'),
-        Input('effectif-filter', 'value')
-    ]
+    Output('keyword-dropdown', 'options'),
+    Input('keyword-dropdown', 'search_value'),
+    State('keyword-dropdown', 'value')
 )
-def mean_funding(categories, year_range, effectif):  # Renommez 'sector' en 'categories'
-    df = get_dataframe("financements.csv")
-    df['Montant_def'] = pd.to_numeric(df['Montant_def'], errors='coerce')  # Conversion en float
-
-    # Charger les données sociétés pour le filtre sur les catégories et l'effectif
-    df_societe = get_dataframe("societes.csv")
-    df_societe['date_creation_def'] = pd.to_datetime(df_societe['date_creation_def'], errors="coerce")
-    df_societe["annee_creation"] = df_societe["date_creation_def"].dt.year  # Extraire l'année
-
-    # Appliquer les filtres
-    if categories:
-        df_societe = df_societe[df_societe["Sous-Catégorie"].str.contains('|'.join(categories), na=False)]
-    if effectif:
-        df_societe = df_societe[df_societe["Effectif_def"].isin(effectif)]
-    if year_range:
-        df_societe = df_societe[(df_societe["annee_creation"] >= year_range[0]) &
-                                (df_societe["annee_creation"] <= year_range[1])]
-
-    # Filtrer les entreprises en fonction des sociétés filtrées
-    df = df[df["entreprise_id"].isin(df_societe["entreprise_id"])]
-
-    # Calcul du financement moyen
-    if df["entreprise_id"].nunique() > 0:
-        mean_funding = df['Montant_def'].fillna(0).sum() / df["entreprise_id"].nunique()
+def search_categories(search_value, selected):
+    return search_options("Sous-Catégorie", search_value, selected)
+
+# Construction des indicateurs et graphiques du dashboard
+# Les fonctions qui reçoivent `agg` lisent les agrégats du cube (datastore.cube.CubeSlice),
+# les autres le résultat du moteur de filtres (datastore.filters.FilterResult)
+def mean_funding(agg):
+    # Calcul du financement moyen par entreprise financée (même définition que pourc_levee)
+    nb_entreprises = agg.companies["financees"].sum()
+    if nb_entreprises > 0:
+        mean_funding = agg.rounds['Montant_def'].sum() / nb_entreprises
     else:
         mean_funding = 0  # Évite la division par zéro
 
     return f"{mean_funding:,.0f} €".replace(",", " ")
 
-@app.callback(
-    Output("total-funding", "children"),
-    [
-        Input('keyword-dropdown', 'value'),  # Remplacez 'sector-filter' par 'keyword-dropdown'
-        Input('year-filter', 'value'),
-        Input('effectif-filter', 'value')
-    ]
-)
-def total_funding(categories, year_range, effectif):  # Renommez 'sector' en 'categories'
-    df = get_dataframe("financements.csv")
-    df_societe = get_dataframe("societes.csv")  # Charge une seule fois
-
-    # Conversion des colonnes
-    df['Montant_def'] = pd.to_numeric(df['Montant_def'], errors='coerce')
-    df_societe['date_creation_def'] = pd.to_datetime(
-        df_societe['date_creation_def'],
-        errors="coerce")
-    df_societe["annee_creation"] = df_societe["date_creation_def"].dt.year  # Extraire l'année
-
-    # Appliquer les filtres
-    if categories:
-        df_societe = df_societe[df_societe["Sous-Catégorie"].str.contains('|'.join(categories), na=False)]
-    if effectif:
-        df_societe = df_societe[df_societe["Effectif_def"].isin(effectif)]
-    if year_range:
-        df_societe = df_societe[
-            (df_societe["annee_creation"].notna()) &  # Évite les NaN
-            (df_societe["annee_creation"].between(year_range[0], year_range[1]))
-        ]
-
-    # Filtrer les entreprises en fonction des sociétés filtrées
-    df = df[df["entreprise_id"].isin(df_societe["entreprise_id"])]
-
+def total_funding(agg):
     # Calcul du financement total
-    total_funding = df['Montant_def'].fillna(0).sum()
+    total_funding = agg.rounds['Montant_def'].sum()
 
     return f"{total_funding:,.0f} €".replace(",", " ")
 
-@app.callback(
-    Output("funding-evolution", "figure"),
-    [
-        Input('keyword-dropdown', 'value'),  # Remplacez 'sector-filter' par 'keyword-dropdown'
-        Input('year-filter', 'value'),
-        Input('effectif-filter', 'value')
-    ]
-)
-def update_funding_graph(categories, year_range, effectif):  # Renommez 'sector' en 'categories'
-    df = get_dataframe("financements.csv")
-    df['Date dernier financement'] = pd.to_datetime(df['Date dernier financement'], errors='coerce')
-    df['Année'] = df['Date dernier financement'].dt.year
-    df['Montant_def'] = pd.to_numeric(df["Montant_def"], errors='coerce').fillna(0)
-
-    df_societe = get_dataframe("societes.csv")
-    df_societe['date_creation_def'] = pd.to_datetime(df_societe['date_creation_def'], errors="coerce")
-    df_societe["annee_creation"] = df_societe["date_creation_def"].dt.year
-
-    # Appliquer les filtres
-    if categories:
-        df_societe = df_societe[df_societe["Sous-Catégorie"].str.contains('|'.join(categories), na=False)]
-    if effectif:
-        df_societe = df_societe[df_societe["Effectif_def"].isin(effectif)]
-    if year_range:
-        df_societe = df_societe[
-            (df["Année"].notna()) &  # Évite les NaN
-            (df["Année"].between(year_range[0], year_range[1]))
-        ]
-
-    # Filtre sur les financements en fonction des sociétés sélectionnées
-    df = df[df["entreprise_id"].isin(df_societe["entreprise_id"])]
-
-    funding_by_year = df.groupby('Année')['Montant_def'].sum().reset_index()
+def update_funding_graph(agg):
+    import plotly.express as px  # Import différé au premier rendu du dashboard
+
+    funding_by_year = agg.rounds.groupby('Année')['Montant_def'].sum().reset_index()
     fig1 = px.line(funding_by_year, x='Année', y='Montant_def')
 
     return fig1
 
-@app.callback(
-    Output("serie-funding", "figure"),
-    [
-        Input('keyword-dropdown', 'value'),  # Remplacez 'sector-filter' par 'keyword-dropdown'
-        Input('year-filter', 'value'),
-        Input('effectif-filter', 'value')
-    ]
-)
-def update_series_graph(categories, year_range, effectif):  # Renommez 'sector' en 'categories'
-    df = get_dataframe("financements.csv")
-    df['Date dernier financement'] = pd.to_datetime(df['Date dernier financement'], errors='coerce')
-    df['Année'] = df['Date dernier financement'].dt.year
-    df['Montant_def'] = pd.to_numeric(df["Montant_def"], errors='coerce').fillna(0)
-
-    df_societe = get_dataframe("societes.csv")
-    df_societe['date_creation_def'] = pd.to_datetime(df_societe['date_creation_def'], errors="coerce")
-    df_societe["annee_creation"] = df_societe["date_creation_def"].dt.year
-
-    # Appliquer les filtres
-    if categories:
-        df_societe = df_societe[df_societe["Sous-Catégorie"].str.contains('|'.join(categories), na=False)]
-    if effectif:
-        df_societe = df_societe[df_societe["Effectif_def"].isin(effectif)]
-    if year_range:
-        df_societe = df_societe[
-            (df_societe["annee_creation"].notna()) &
-            (df_societe["annee_creation"].between(year_range[0], year_range[1]))
-        ]
-
-    df = df[df["entreprise_id"].isin(df_societe["entreprise_id"])]
-
-    # Vérifier si df est vide après filtrage
-    if df.empty:
+def update_series_graph(agg):
+    import plotly.express as px
+
+    # Vérifier s'il reste des levées après filtrage
+    if agg.rounds.empty:
         return px.bar(title="Aucune donnée disponible")
 
-    # Correction : Renommer correctement les colonnes après value_counts()
-    funding_by_series = df["Série"].value_counts().nlargest(10).reset_index()
+    # Série est catégorielle : on ignore les modalités absentes du filtre
+    funding_by_series = agg.rounds.groupby("Série", observed=True)["levees"].sum().sort_values(ascending=False, kind="stable")
+    funding_by_series = funding_by_series[funding_by_series > 0].nlargest(10).reset_index()
     funding_by_series.columns = ['Série', 'Nombre']
 
     fig2 = px.bar(funding_by_series, x='Série', y='Nombre')
 
     return fig2
 
-@app.callback(
-    Output("startup-year", "figure"),
-    [
-        Input('keyword-dropdown', 'value'),  # Remplacez 'sector-filter' par 'keyword-dropdown'
-        Input('year-filter', 'value'),
-        Input('effectif-filter', 'value')
-    ]
-)
-def startup_per_year(categories, year_range, effectif):  # Renommez 'sector' en 'categories'
-    df = get_dataframe("financements.csv")
-    df['Date dernier financement'] = pd.to_datetime(df['Date dernier financement'], errors='coerce')
-    df['Année'] = df['Date dernier financement'].dt.year
-    df['Montant_def'] = pd.to_numeric(df["Montant_def"], errors='coerce').fillna(0)
-    df_societe = get_dataframe("societes.csv")
-    df_societe['date_creation_def'] = pd.to_datetime(df_societe['date_creation_def'], errors="coerce")
-    df_societe["annee_creation"] = df_societe["date_creation_def"].dt.year  # Extraire l'année
-
-    # Appliquer les filtres
-    if categories:
-        df_societe = df_societe[df_societe["Sous-Catégorie"].str.contains('|'.join(categories), na=False)]
-    if effectif:
-        df_societe = df_societe[df_societe["Effectif_def"].isin(effectif)]
-    if year_range:
-        df_societe = df_societe[
-            (df_societe["annee_creation"].notna()) &  # Évite les NaN
-            (df_societe["annee_creation"].between(1986, year_range[1]))
-        ]
-
-    df = df[df["entreprise_id"].isin(df_societe["entreprise_id"])]
-    startups_by_year = df_societe.groupby('annee_creation').agg({'entreprise_id': 'count'}).reset_index()
+def startup_per_year(agg):
+    import plotly.express as px
+
+    startups_by_year = agg.companies.groupby('annee_creation')['entreprises'].sum().reset_index()
     startups_by_year.columns = ['annee_creation', 'nombre_startups']
 
     fig3 = px.line(startups_by_year, x='annee_creation', y='nombre_startups')
 
     return fig3
 
-@app.callback(
-    Output("top-funded", "figure"),
-    [
-        Input('keyword-dropdown', 'value'),  # Remplacez 'sector-filter' par 'keyword-dropdown'
-        Input('year-filter', 'value'),
-        Input('effectif-filter', 'value')
-    ]
-)
-def top_funded(categories, year_range, effectif):  # Renommez 'sector' en 'categories'
-    df = get_dataframe("financements.csv")
-    df['Date dernier financement'] = pd.to_datetime(df['Date dernier financement'], errors='coerce')
-    df['Année'] = df['Date dernier financement'].dt.year
-    df['Montant_def'] = pd.to_numeric(df["Montant_def"], errors='coerce').fillna(0)
-    df_societe = get_dataframe("societes.csv")
-    df_societe['date_creation_def'] = pd.to_datetime(df_societe['date_creation_def'], errors="coerce")
-    df_societe["annee_creation"] = df_societe["date_creation_def"].dt.year  # Extraire l'année
-
-    # Appliquer les filtres
-    if categories:
-        df_societe = df_societe[df_societe["Sous-Catégorie"].str.contains('|'.join(categories), na=False)]
-    if effectif:
-        df_societe = df_societe[df_societe["Effectif_def"].isin(effectif)]
-    if year_range:
-        df_societe = df_societe[
-            (df_societe["annee_creation"].notna()) &  # Évite les NaN
-            (df_societe["annee_creation"].between(year_range[0], year_range[1]))
-        ]
-
-    df = df[df["entreprise_id"].isin(df_societe["entreprise_id"])]
-
-    top_funded_companies = df.groupby("entreprise_id")["Montant_def"].sum().nlargest(10).reset_index()
-    top_funded_companies = top_funded_companies.merge(df_societe, on="entreprise_id", how="left")
+def top_funded(result):
+    import plotly.express as px
+
+    top_funded_companies = result.financements.groupby("entreprise_id")["Montant_def"].sum().nlargest(10).reset_index()
+    top_funded_companies = top_funded_companies.merge(result.societes, on="entreprise_id", how="left")
     fig4 = px.bar(top_funded_companies, x='nom', y='Montant_def')
 
     return fig4
 
-@app.callback(
-    Output("pourc-leve", "children"),
-    [
-        Input('keyword-dropdown', 'value'),  # Remplacez 'sector-filter' par 'keyword-dropdown'
-        Input('year-filter', 'value'),
-        Input('effectif-filter', 'value')
-    ]
-)
-def pourc_levee(categories, year_range, effectif):  # Renommez 'sector' en 'categories'
-    df = get_dataframe("financements.csv")
-    df['Date dernier financement'] = pd.to_datetime(df['Date dernier financement'], errors='coerce')
-    df['Année'] = df['Date dernier financement'].dt.year
-    df['Montant_def'] = pd.to_numeric(df["Montant_def"], errors='coerce').fillna(0)
-    df_societe = get_dataframe("societes.csv")
-    df_societe['date_creation_def'] = pd.to_datetime(df_societe['date_creation_def'], errors="coerce")
-    df_societe["annee_creation"] = df_societe["date_creation_def"].dt.year  # Extraire l'année
-
-    # Appliquer les filtres
-    if categories:
-        df_societe = df_societe[df_societe["Sous-Catégorie"].str.contains('|'.join(categories), na=False)]
-    if effectif:
-        df_societe = df_societe[df_societe["Effectif_def"].isin(effectif)]
-    if year_range:
-        df_societe = df_societe[
-            (df_societe["annee_creation"].notna()) &  # Évite les NaN
-            (df_societe["annee_creation"].between(year_range[0], year_range[1]))
-        ]
-
-    df = df[df["entreprise_id"].isin(df_societe["entreprise_id"])]
-
+def pourc_levee(agg):
     # Calcul de la part des entreprises ayant levé des fonds
-    nb_total_entreprises = df_societe.shape[0]
-    nb_entreprises_funded = df["Montant_def"].nunique()
-    part_funded = (nb_entreprises_funded / nb_total_entreprises) * 100
+    nb_total_entreprises = agg.companies["entreprises"].sum()
+    nb_entreprises_funded = agg.companies["financees"].sum()
+    part_funded = (nb_entreprises_funded / nb_total_entreprises) * 100 if nb_total_entreprises else 0
 
     return f"{part_funded:.2f}%"
 
-@app.callback(
-    Output("nbre-startup", "children"),
-    [
-        Input('keyword-dropdown', 'value'),  # Remplacez 'sector-filter' par 'keyword-dropdown'
-        Input('year-filter', 'value'),
-        Input('effectif-filter', 'value')
-    ]
-)
-def nbre_startup(categories, year_range, effectif):  # Renommez 'sector' en 'categories'
-    df = get_dataframe("financements.csv")
-    df['Date dernier financement'] = pd.to_datetime(df['Date dernier financement'], errors='coerce')
-    df['Année'] = df['Date dernier financement'].dt.year
-    df['Montant_def'] = pd.to_numeric(df["Montant_def"], errors='coerce').fillna(0)
-    df_societe = get_dataframe("societes.csv")
-    df_societe['date_creation_def'] = pd.to_datetime(df_societe['date_creation_def'], errors="coerce")
-    df_societe["annee_creation"] = df_societe["date_creation_def"].dt.year  # Extraire l'année
-
-    # Appliquer les filtres
-    if categories:
-        df_societe = df_societe[df_societe["Sous-Catégorie"].str.contains('|'.join(categories), na=False)]
-    if effectif:
-        df_societe = df_societe[df_societe["Effectif_def"].isin(effectif)]
-    if year_range:
-        df_societe = df_societe[
-            (df_societe["annee_creation"].notna()) &  # Évite les NaN
-            (df_societe["annee_creation"].between(year_range[0], year_range[1]))
-        ]
-
-    df = df[df["entreprise_id"].isin(df_societe["entreprise_id"])]
-
-    # Calcul du nombre unique de startups
-    nbre_start = df_societe['nom'].nunique()
+def nbre_startup(agg):
+    # Calcul du nombre de startups
+    nbre_start = agg.companies["entreprises"].sum()
 
     # Formater avec un espace comme séparateur de milliers
     formatted_nbre_start = f"{nbre_start:,}".replace(",", " ")
 
     return formatted_nbre_start
 
-@app.callback(
-    Output("top-sector", "figure"),
-    [
-        Input('keyword-dropdown', 'value'),  # Remplacez 'sector-filter' par 'keyword-dropdown'
-        Input('year-filter', 'value'),
-        Input('effectif-filter', 'value')
-    ]
-)
-def top_sector(categories, year_range, effectif):  # Renommez 'sector' en 'categories'
-    df = get_dataframe("societes.csv")
-    df['date_creation_def'] = pd.to_datetime(df['date_creation_def'], errors="coerce")
-    df["annee_creation"] = df["date_creation_def"].dt.year  # Extraire l'année
-    # Dictionnaire des secteurs d'activité (codes NAF partiels)
-    dict_secteurs = {
-        '01': 'Agriculture',
-        '02': 'Sylviculture et exploitation forestière',
-        '03': 'Pêche et aquaculture',
-        '05': 'Extraction de houille et de lignite',
-        '08': 'Autres industries extractives',
-        '10': 'Industries alimentaires',
-        '13': 'Fabrication de textiles',
-        '18': 'Imprimerie et reproduction d\'enregistrements',
-        '26': 'Fabrication de produits informatiques et électroniques',
-        '32': 'Autres industries manufacturières',
-        '41': 'Construction de bâtiments',
-        '43': 'Travaux de construction spécialisés',
-        '49': 'Transports terrestres et transport par conduites',
-        '56': 'Restauration',
-        '58': 'Édition',
-        '61': 'Télécommunications',
-        '62': 'Programmation, conseil et autres activités informatiques',
-        '63': 'Services d’information',
-        '64': 'Activités financières et d’assurance',
-        '68': 'Activités immobilières',
-        '70': 'Activités des sièges sociaux, conseil en gestion',
-        '71': 'Ingénierie et études techniques',
-        '72': 'Recherche et développement scientifique',
-        '73': 'Publicité et études de marché',
-        '74': 'Autres activités spécialisées, scientifiques et techniques',
-        '77': 'Location et exploitation de biens immobiliers',
-        '82': 'Activités administratives et autres services de soutien'
-    }
-    # Étape 1 : Extraire les 2 premiers chiffres du code de l'activité principale
-    df['Secteur'] = df['Activité principale'].str[:2]
-    # Étape 2 : Mapper avec le dictionnaire des secteurs
-    df['Nom Secteur'] = df['Secteur'].map(dict_secteurs)
-    # Calculer la distribution des valeurs et trier par ordre décroissant
+def top_sector(agg):
+    import plotly.express as px
 
-    if categories:
-        df = df[df["Sous-Catégorie"].str.contains('|'.join(categories), na=False)]
-    if effectif:
-        df = df[df["Effectif_def"].isin(effectif)]
-    if year_range:
-        df = df[
-            (df["annee_creation"].notna()) &  # Évite les NaN
-            (df["annee_creation"].between(year_range[0], year_range[1]))
-        ]
-
-    distribution = df['Nom Secteur'].value_counts().reset_index()
+    # Calculer la distribution des valeurs et trier par ordre décroissant
+    distribution = agg.companies.groupby('Nom Secteur')['entreprises'].sum().sort_values(ascending=False, kind="stable").reset_index()
     distribution.columns = ['Nom Secteur', 'Count']
     distribution_top5 = distribution.sort_values(by='Count', ascending=True).tail(5)
 
@@ -448,30 +192,12 @@ def top_sector(categories, year_range, effectif):  # Renommez 'sector' en 'categ
 
     return fig5
 
-@app.callback(
-    Output("top-startup-size", "figure"),
-    [
-        Input('keyword-dropdown', 'value'),  # Remplacez 'sector-filter' par 'keyword-dropdown'
-        Input('year-filter', 'value'),
-        Input('effectif-filter', 'value')
-    ]
-)
-def top_startup_size(categories, year_range, effectif):  # Renommez 'sector' en 'categories'
-    df = get_dataframe("societes.csv")
-    df['date_creation_def'] = pd.to_datetime(df['date_creation_def'], errors="coerce")
-    df["annee_creation"] = df["date_creation_def"].dt.year  # Extraire l'année
-    if categories:
-        df = df[df["Sous-Catégorie"].str.contains('|'.join(categories), na=False)]
-    if effectif:
-        df = df[df["Effectif_def"].isin(effectif)]
-    if year_range:
-        df = df[
-            (df["annee_creation"].notna()) &  # Évite les NaN
-            (df["annee_creation"].between(year_range[0], year_range[1]))
-        ]
+def top_startup_size(agg):
+    import plotly.express as px
 
-    # Calculer la distribution des valeurs et trier par ordre décroissant
-    distribution = df['Effectif_def'].value_counts().reset_index()
+    # Calculer la distribution des valeurs (hors tailles absentes du filtre)
+    distribution = agg.companies.groupby('Effectif_def', observed=True)['entreprises'].sum().sort_values(ascending=False, kind="stable")
+    distribution = distribution[distribution > 0].reset_index()
     distribution.columns = ['Effectif', 'Count']
     # Filtrer pour afficher uniquement le TOP 5
     distribution_top5 = distribution.sort_values(by='Count', ascending=True).tail(5)
@@ -480,88 +206,49 @@ def top_startup_size(categories, year_range, effectif):  # Renommez 'sector' en
 
     return fig6
 
-@app.callback(
-    Output("cloud-words", "figure"),
-    [
-        Input('keyword-dropdown', 'value'),  # Remplacez 'sector-filter' par 'keyword-dropdown'
-        Input('year-filter', 'value'),
-        Input('effectif-filter', 'value')
-    ]
-)
-def top_startup_size(categories, year_range, effectif):  # Renommez 'sector' en 'categories'
-    from wordcloud import WordCloud
-    from collections import Counter
-    import plotly.graph_objects as go
-
-    df = get_dataframe("societes.csv")
-    df['date_creation_def'] = pd.to_datetime(df['date_creation_def'], errors="coerce")
-    df["annee_creation"] = df["date_creation_def"].dt.year  # Extraire l'année
-    if categories:
-        df = df[df["Sous-Catégorie"].str.contains('|'.join(categories), na=False)]
-    if effectif:
-        df = df[df["Effectif_def"].isin(effectif)]
-    if year_range:
-        df = df[
-            (df["annee_creation"].notna()) &  # Évite les NaN
-            (df["annee_creation"].between(year_range[0], year_range[1]))
-        ]
-
-    df['mots_cles_def'] = df['mots_cles_def'].fillna('')
-    # Fusionner les mots-clés de toutes les lignes en une seule grande chaîne
-    all_keywords = ','.join(df['mots_cles_def'].astype(str))
-    # Diviser les mots-clés en une liste de mots individuels
-    keywords_list = [keyword.strip() for keyword in all_keywords.split(',') if keyword.strip()]
-    # Utiliser Counter pour compter la fréquence des mots-clés
-    keywords_freq = Counter(keywords_list)
-    # Convertir le résultat en DataFrame trié
-    keywords_df = pd.DataFrame(keywords_freq.items(), columns=['Mot', 'Count']).sort_values(by='Count', ascending=False)
-    # Créer un dictionnaire des mots avec leurs fréquences
-    word_freq = dict(zip(keywords_df['Mot'], keywords_df['Count']))
-    # Générer le nuage de mots
-    wordcloud = WordCloud(width=1000, height=600, background_color='white', colormap='viridis').generate_from_frequencies(word_freq)
-    img = wordcloud.to_array()
-
-    # Créer une figure Plotly avec l'image du nuage de mots
-    fig = go.Figure()
-    fig.add_trace(
-        go.Image(z=img)
-    )
-    fig.update_layout(
-        margin={"r": 10, "t": 40, "l": 10, "b": 10},
-        xaxis=dict(visible=False),  # Cacher l'axe X
-        yaxis=dict(visible=False)   # Cacher l'axe Y
-    )
+def cloud_words(result):
+    # Le nuage est rendu par la route /wordcloud au chargement de l'image : le callback ne renvoie que son URL
+    return f"/wordcloud/{result.digest}.png?" + urlencode({"filtre": json.dumps(result.key)})
 
-    return fig
+def render_word_cloud(frequencies):
+    from wordcloud import WordCloud
+    from PIL import Image
 
-#Graph catégories: 
-@app.callback(
-    Output("top-subcategories", "figure"),
-    [
-        Input('keyword-dropdown', 'value'),  # Remplacez 'sector-filter' par 'keyword-dropdown'
-        Input('year-filter', 'value'),
-        Input('effectif-filter', 'value')
-    ]
-)
-def update_top_subcategories(categories, year_range, effectif):  # Renommez 'sector' en 'categories'
-    df2 = get_dataframe("societes.csv") 
-    
-    df2['date_creation_def'] = pd.to_datetime(df2['date_creation_def'], errors="coerce")
-    df2["annee_creation"] = df2["date_creation_def"].dt.year
-
-    # Appliquer les filtres
-    if categories:
-        df2 = df2[df2["Sous-Catégorie"].str.contains('|'.join(categories), na=False)]
-    if effectif:
-        df2 = df2[df2["Effectif_def"].isin(effectif)]
-    if year_range:
-        df2 = df2[
-            (df2["annee_creation"].notna()) &
-            (df2["annee_creation"].between(year_range[0], year_range[1]))
-        ]
-
-    # Vérifier si la colonne 'Sous-Catégorie' existe et contient des valeurs valides
-    if "Sous-Catégorie" not in df2.columns or df2["Sous-Catégorie"].dropna().empty:
+    if frequencies:
+        image = WordCloud(width=1000, height=600, background_color='white', colormap='viridis').generate_from_frequencies(frequencies).to_image()
+    else:
+        image = Image.new("RGB", (1000, 600), "white")  # Aucun mot-clé pour ce filtre
+
+    # PNG à palette réduite : moins de 100 Ko au lieu du tableau de pixels dans la figure
+    buffer = io.BytesIO()
+    image.convert("P", palette=Image.Palette.ADAPTIVE, colors=64).save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+@app.server.route("/wordcloud/<digest>.png")
+def word_cloud_png(digest):
+    store = get_store()
+    try:
+        categories, year_range, effectif = json.loads(request.args.get("filtre", "[[], null, []]"))
+        result = evaluate(store, filter_key(categories, year_range, effectif))
+    except (TypeError, ValueError, IndexError):
+        return jsonify(error="Paramètre filtre invalide"), 400
+
+    # Empreinte d'une autre version des données : on redirige vers l'image du filtre à jour
+    if result.digest != digest:
+        return redirect(cloud_words(result))
+
+    # Fréquences sommées sur les lignes retenues (l'index de result.societes est la position dans le store)
+    key = ResultCache.make_key("wordcloud", store.version, digest)
+    png = results.get_or_build(key, lambda: render_word_cloud(store.keywords().frequencies(result.societes.index.to_numpy())))
+    return Response(png, mimetype="image/png", headers={"Cache-Control": "public, max-age=86400"})
+
+def update_top_subcategories(result):
+    import plotly.express as px
+
+    df2 = result.societes
+
+    # Vérifier si la colonne 'Sous-Catégorie' contient des valeurs valides
+    if df2["Sous-Catégorie"].dropna().empty:
         return px.bar(title="Aucune donnée disponible")
 
     # Séparer les sous-catégories (elles sont séparées par "|") et compter les occurrences uniques
@@ -585,5 +272,139 @@ def update_top_subcategories(categories, year_range, effectif):  # Renommez 'sec
 
     return fig
 
+# Sorties du dashboard : (id, propriété, fonction de construction, source des données)
+DASHBOARD_OUTPUTS = [
+    ("total-funding", "children", total_funding, "cube"),
+    ("mean-funding", "children", mean_funding, "cube"),
+    ("nbre-startup", "children", nbre_startup, "cube"),
+    ("pourc-leve", "children", pourc_levee, "cube"),
+    ("serie-funding", "figure", update_series_graph, "cube"),
+    ("funding-evolution", "figure", update_funding_graph, "cube"),
+    ("top-funded", "figure", top_funded, "filtre"),
+    ("startup-year", "figure", startup_per_year, "cube"),
+    ("top-sector", "figure", top_sector, "cube"),
+    ("top-startup-size", "figure", top_startup_size, "cube"),
+    ("top-subcategories", "figure", update_top_subcategories, "filtre"),
+    ("cloud-words", "src", cloud_words, "filtre"),
+]
+
+# Temps de construction de chaque sortie (en secondes), publiés sur /metrics
+BUILD_TIMINGS = {
+    output_id: metrics.summary("starthub_dashboard_output_seconds", "Temps de construction des sorties du dashboard (hors cache)", output=output_id)
+    for output_id, _, _, _ in DASHBOARD_OUTPUTS
+}
+
+def fingerprint(value):
+    # Empreinte du contenu sérialisé d'une sortie, pour ne renvoyer que ce qui a changé
+    payload = json.dumps(value, cls=PlotlyJSONEncoder, sort_keys=True)
+    return hashlib.blake2b(payload.encode(), digest_size=12).hexdigest()
+
+def build_dashboard(result, aggregates):
+    # Construit toutes les sorties à partir d'un même résultat de filtre et de ses agrégats
+    sources = {"cube": aggregates, "filtre": result}
+    values, fingerprints = {}, {}
+    for output_id, _, build, source in DASHBOARD_OUTPUTS:
+        start = time.perf_counter()
+        value = build(sources[source])
+        BUILD_TIMINGS[output_id].observe(time.perf_counter() - start)
+
+        # Les figures sont stockées sous forme de dict : sérialisables par le cache et par Dash
+        values[output_id] = value.to_dict() if isinstance(value, go.Figure) else value
+        fingerprints[output_id] = fingerprint(values[output_id])
+    return {"digest": result.digest, "values": values, "fingerprints": fingerprints}
+
+def dashboard_entry(categories, year_range, effectif):
+    # Sorties du dashboard pour un état de filtres, calculées une seule fois par version des données.
+    # Un seul store pour toute la construction : un rechargement en cours ne mélange pas deux versions
+    store = get_store()
+    key = filter_key(categories, year_range, effectif)
+
+    def build():
+        with metrics.phase("load"):
+            result = evaluate(store, key)
+        # Au plus une catégorie : tranche du cube ; sinon agrégats calculés sur les lignes filtrées
+        aggregates = store.cube().slice(key) if Cube.supports(key) else summarize(result)
+        return build_dashboard(result, aggregates)
+
+    return results.get_or_build(ResultCache.make_key("dashboard", store.version, key), build)
+
+# Callback unique : un seul calcul de filtre et un seul aller-retour HTTP pour toutes les sorties
+@app.callback(
+    [Output(output_id, prop) for output_id, prop, _, _ in DASHBOARD_OUTPUTS] + [Output("dashboard-fingerprints", "data")],
+    [
+        Input('keyword-dropdown', 'value'),
+        Input('year-filter', 'value'),
+        Input('effectif-filter', 'value')
+    ],
+    State("dashboard-fingerprints", "data")
+)
+def update_dashboard(categories, year_range, effectif, fingerprints):
+    fingerprints = fingerprints or {}
+    start = time.perf_counter()
+    entry = dashboard_entry(categories, year_range, effectif)
+    callback_context.record_timing("dashboard", time.perf_counter() - start, "filtre et construction (ou cache)")
+
+    # Même ensemble d'entreprises que le rendu précédent : rien à renvoyer
+    if fingerprints.get("filtre") == entry["digest"]:
+        raise PreventUpdate
+
+    # Sortie identique à celle déjà affichée : pas de renvoi au navigateur
+    values = [
+        no_update if fingerprints.get(output_id) == entry["fingerprints"][output_id] else entry["values"][output_id]
+        for output_id, _, _, _ in DASHBOARD_OUTPUTS
+    ]
+    return values + [dict(entry["fingerprints"], filtre=entry["digest"])]
+
+# Mesures des callbacks de ce worker, au format texte Prometheus
+@app.server.route("/metrics")
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+# API JSON : entreprises les plus proches d'un point, ou dans un rayon en km
+# /api/nearby?lat=48.85&lon=2.35&k=10 ou /api/nearby?lat=48.85&lon=2.35&radius_km=5, filtrable par &categorie=...
+MAX_NEARBY_RESULTS = 500
+
+@app.server.route("/api/nearby")
+def api_nearby():
+    lat = request.args.get("lat", type=float)
+    lon = request.args.get("lon", type=float)
+    # Paramètres facultatifs : présents mais illisibles, ils sont refusés plutôt que remplacés
+    k = request.args.get("k", type=int) if "k" in request.args else 10
+    radius_km = request.args.get("radius_km", type=float) if "radius_km" in request.args else None
+    if lat is None or lon is None or not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return jsonify(error="Paramètres lat et lon invalides"), 400
+    if k is None or k < 1 or ("radius_km" in request.args and (radius_km is None or radius_km <= 0)):
+        return jsonify(error="Paramètres k et radius_km doivent être des nombres positifs"), 400
+    k = min(k, MAX_NEARBY_RESULTS)
+
+    store = get_store()
+    categories = request.args.getlist("categorie")
+    mask = store.index("Sous-Catégorie").mask(categories) if categories else None
+    if radius_km is None:
+        rows, distances = store.nearby().nearest(lat, lon, k, mask)
+    else:
+        rows, distances = store.nearby().within(lat, lon, radius_km, mask)
+        rows, distances = rows[:MAX_NEARBY_RESULTS], distances[:MAX_NEARBY_RESULTS]
+
+    societes = store.table("societes.csv").iloc[rows]
+    return jsonify(results=[
+        {"entreprise_id": int(row.entreprise_id), "nom": row.nom, "adresse": row.adresse_def,
+         "latitude": row.latitude, "longitude": row.longitude, "distance_km": round(float(distance), 3)}
+        for row, distance in zip(societes.itertuples(index=False), distances)
+    ])
+
+# Préchauffage optionnel des caches avant de servir les premières requêtes
+if os.environ.get("STARTHUB_WARMUP") == "1":
+    from warmup import warm_up
+    warm_up()
+
+# Préparation des pages en arrière-plan : le serveur répond pendant ce temps
+if os.environ.get("STARTHUB_PRELOAD") == "1":
+    from warmup import start_preload_thread
+    start_preload_thread()
+
 if __name__ == '__main__':
+    from datastore.reloader import start_watcher
+    from warmup import refresh_caches
+    start_watcher(refresh_caches)  # Rechargement des csv modifiés sans redémarrer
     app.run_server(debug=True)
\ No newline at end of file
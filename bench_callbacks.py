@@ -0,0 +1,434 @@
+# Banc de charge des callbacks Dash : parcours d'utilisateurs rejoués sur /_dash-update-component
+#   python bench_callbacks.py [--sessions 20] [--steps 10] [--seed 0] [--parcours dashboard carte profil]
+#   python bench_callbacks.py --save-baseline main      (référence dans artifacts/bench/main.json)
+#   python bench_callbacks.py --compare main           (code de sortie 1 si un callback régresse)
+# L'application tourne dans ce processus (client de test Flask, sans réseau) avec un cache partagé vide.
+# Les callbacks sont déclenchés comme par le navigateur : au montage des composants puis en cascade.
+import argparse
+import base64
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import numpy as np
+
+CITIES = ["Paris", "Lyon", "Marseille", "Toulouse", "Nantes", "Bordeaux", "Lille", "Rennes", "Grenoble", "Montpellier"]
+FRANCE = {"lat": 46.6, "lon": 2.4}
+TOLERANCE = 0.25  # Hausse relative du p95 tolérée par --compare
+FLOOR_MS = 5.0  # Hausse absolue du p95 en dessous de laquelle un écart est du bruit
+
+
+def id_key(component_id):
+    # Identifiant tel que Dash l'écrit dans les réponses : json trié et compact pour les identifiants dict
+    return json.dumps(component_id, sort_keys=True, separators=(",", ":")) if isinstance(component_id, dict) else component_id
+
+
+def is_component(value):
+    return isinstance(value, dict) and {"type", "namespace", "props"} <= value.keys()
+
+
+def decode_array(value):
+    # Tableaux des figures plotly, éventuellement encodés en base64 ("bdata")
+    if isinstance(value, dict) and "bdata" in value:
+        return np.frombuffer(base64.b64decode(value["bdata"]), dtype=value["dtype"]).tolist()
+    return value or []
+
+
+class Browser:
+    """Navigateur simulé : propriétés des composants affichés, callbacks déclenchés au montage et en cascade."""
+
+    def __init__(self, client, dependencies, names, record):
+        self.client = client
+        self.dependencies = dependencies
+        self.names = names  # sortie -> nom du callback
+        self.record = record  # (nom, secondes, octets, statut HTTP) de chaque requête
+        self.props = {}  # (identifiant, propriété) -> valeur
+        self.ids = {}  # identifiant -> identifiant d'origine (dict pour les identifiants à motif)
+        self.owned = {}  # (identifiant, propriété) -> composants montés par cette propriété
+
+    def open(self, pathname):
+        layout = self.client.get("/_dash-layout").get_json()
+        mounted = self._mount(layout)
+        self.props[("url", "pathname")] = pathname
+        self._run({("url", "pathname")}, mounted)
+
+    def navigate(self, pathname):
+        self.act({("url", "pathname"): pathname})
+
+    def act(self, changes):
+        # Action de l'utilisateur : propriétés modifiées puis callbacks déclenchés
+        self.props.update(changes)
+        self._run(set(changes), set())
+
+    def click(self, key):
+        self.act({(key, "n_clicks"): (self.props.get((key, "n_clicks")) or 0) + 1})
+
+    def matching(self, id_str):
+        # Composants affichés correspondant à l'identifiant d'une dépendance (motif ALL compris)
+        if not id_str.startswith("{"):
+            return [id_str] if id_str in self.ids else []
+        pattern = json.loads(id_str)
+        return [
+            key for key, component_id in self.ids.items()
+            if isinstance(component_id, dict) and component_id.keys() == pattern.keys()
+            and all(value == ["ALL"] or component_id[name] == value for name, value in pattern.items())
+        ]
+
+    def _mount(self, value):
+        mounted = set()
+        if isinstance(value, list):
+            for item in value:
+                mounted |= self._mount(item)
+        elif is_component(value):
+            props = value["props"]
+            key = id_key(props["id"]) if "id" in props else None
+            if key is not None:
+                self.ids[key] = props["id"]
+                mounted.add(key)
+            for prop, prop_value in props.items():
+                if key is not None and prop != "id":
+                    self.props[(key, prop)] = prop_value
+                mounted |= self._mount(prop_value)
+        return mounted
+
+    def _unmount(self, keys):
+        for key in keys:
+            self.ids.pop(key, None)
+        self.props = {item: value for item, value in self.props.items() if item[0] not in keys}
+        self.owned = {item: value for item, value in self.owned.items() if item[0] not in keys}
+
+    def _update(self, key, prop, value):
+        self._unmount(self.owned.pop((key, prop), set()))
+        self.props[(key, prop)] = value
+        mounted = self._mount(value)
+        if mounted:
+            self.owned[(key, prop)] = mounted
+        # Images servies par l'application (nuage de mots) : chargées par le navigateur
+        if prop == "src" and isinstance(value, str) and value.startswith("/"):
+            self._fetch(value)
+        return mounted
+
+    def _fetch(self, url):
+        start = time.perf_counter()
+        response = self.client.get(url, follow_redirects=True)
+        self.record(f"GET /{url.split('/')[1]}", time.perf_counter() - start, len(response.data), response.status_code)
+
+    def _triggers(self, dependency, changed, mounted):
+        # Comme le renderer Dash : entrées modifiées ou montées, et appel initial des callbacks
+        # dont une sortie vient d'être montée (sauf prevent_initial_call)
+        initial = not dependency.get("prevent_initial_call")
+        triggers = set()
+        for item in dependency["inputs"]:
+            keys = self.matching(item["id"])
+            if not keys and not item["id"].startswith("{"):
+                return None  # Entrée absente de la page : le callback ne peut pas être appelé
+            for key in keys:
+                if (key, item["property"]) in changed or (initial and key in mounted):
+                    triggers.add((key, item["property"]))
+        if triggers or (initial and any(key in mounted for key, _ in self._outputs(dependency))):
+            return triggers
+        return None
+
+    def _outputs(self, dependency):
+        output = dependency["output"]
+        items = output.strip(".").split("...") if output.startswith("..") else [output]
+        return [tuple(item.rsplit(".", 1)) for item in items]
+
+    def _spec(self, item):
+        if item["id"].startswith("{"):
+            return [
+                {"id": self.ids[key], "property": item["property"], "value": self.props.get((key, item["property"]))}
+                for key in self.matching(item["id"])
+            ]
+        return {"id": item["id"], "property": item["property"], "value": self.props.get((item["id"], item["property"]))}
+
+    def _run(self, changed, mounted):
+        # Chaque callback est appelé au plus une fois par action : les cycles passant par le
+        # layout (cartes recommandées -> profil -> nouvelles cartes) s'arrêtent comme dans le navigateur
+        pending = {}  # indice de la dépendance -> propriétés déclencheuses
+        done = set()
+        while changed or mounted or pending:
+            for index, dependency in enumerate(self.dependencies):
+                if index in done:
+                    continue
+                triggers = self._triggers(dependency, changed, mounted)
+                if triggers is not None:
+                    pending[index] = pending.get(index, set()) | triggers
+            if not pending:
+                return
+
+            # Un callback dont une entrée est la sortie d'un autre callback en attente passe après lui
+            outputs = {item for index in pending for item in self._outputs(self.dependencies[index])}
+            ready = [
+                index for index in pending
+                if not any((key, item["property"]) in outputs
+                           for item in self.dependencies[index]["inputs"] for key in self.matching(item["id"]))
+            ] or list(pending)
+
+            changed, mounted = set(), set()
+            for index in ready:
+                done.add(index)
+                new_changed, new_mounted = self._call(self.dependencies[index], pending.pop(index))
+                changed |= new_changed
+                mounted |= new_mounted
+
+    def _call(self, dependency, triggers):
+        payload = {
+            "output": dependency["output"],
+            "outputs": [
+                {"id": json.loads(key) if key.startswith("{") else key, "property": prop}
+                for key, prop in self._outputs(dependency)
+            ],
+            "inputs": [self._spec(item) for item in dependency["inputs"]],
+            "state": [self._spec(item) for item in dependency["state"]],
+            "changedPropIds": [f"{key}.{prop}" for key, prop in triggers],
+        }
+        if not dependency["output"].startswith(".."):
+            payload["outputs"] = payload["outputs"][0]
+
+        name = self.names[dependency["output"]]
+        start = time.perf_counter()
+        response = self.client.post("/_dash-update-component", json=payload)
+        self.record(name, time.perf_counter() - start, len(response.data), response.status_code)
+        if response.status_code == 204:  # PreventUpdate
+            return set(), set()
+        if response.status_code != 200:
+            raise RuntimeError(f"{name} : HTTP {response.status_code}\n{response.get_data(as_text=True)[-2000:]}")
+
+        changed, mounted = set(), set()
+        for key, props in response.get_json()["response"].items():
+            for prop, value in props.items():
+                mounted |= self._update(key, prop, value)
+                changed.add((key, prop))
+        return changed, mounted
+
+
+# Parcours : une session par appel, suite d'actions tirées par le générateur de la session
+
+def type_text(browser, key, text, rng):
+    # Saisie lettre par lettre (les premières lettres) dans un champ de recherche
+    for n in range(1, min(len(text), rng.randint(2, 5)) + 1):
+        browser.act({(key, "search_value" if key.endswith("dropdown") else "value"): text[:n]})
+
+
+def dashboard_trace(browser, rng, data, steps):
+    browser.navigate("/dashboard2")
+    for _ in range(steps):
+        action = rng.choice(["categories", "categories", "recherche", "annees", "effectif", "reset"])
+        if action == "categories":
+            browser.act({("keyword-dropdown", "value"): rng.sample(data["categories"], rng.choice([1, 1, 2]))})
+        elif action == "recherche":
+            type_text(browser, "keyword-dropdown", rng.choice(data["categories"]), rng)
+        elif action == "annees":
+            first, last = data["years"]
+            start = rng.randint(first, last - 1)
+            browser.act({("year-filter", "value"): [start, rng.randint(start + 1, last)]})
+        elif action == "effectif":
+            browser.act({("effectif-filter", "value"): rng.sample(data["effectifs"], rng.choice([1, 2]))})
+        else:
+            browser.act({("keyword-dropdown", "value"): [], ("effectif-filter", "value"): [],
+                         ("year-filter", "value"): list(data["years"])})
+
+
+def map_trace(browser, rng, data, steps):
+    browser.navigate("/map")
+    for _ in range(steps):
+        action = rng.choice(["recherche", "deplacement", "survol", "survol"])
+        if action == "recherche":
+            city = rng.choice(CITIES)
+            for n in range(3, len(city) + 1):
+                browser.act({("location-search", "value"): city[:n]})
+            browser.act({("radius-search", "value"): rng.choice([None, 5, 20])})
+            if rng.random() < 0.3:
+                browser.act({("keyword-dropdown", "value"): [rng.choice(data["categories"])]})
+            browser.click("search-button")
+        elif action == "deplacement":
+            center = {"lat": FRANCE["lat"] + rng.uniform(-3, 3), "lon": FRANCE["lon"] + rng.uniform(-3, 3)}
+            browser.act({("map-graph", "relayoutData"): {"mapbox.center": center, "mapbox.zoom": rng.uniform(5, 10)}})
+        else:
+            browser.act({("map-graph", "hoverData"): hover_point(browser, rng)})
+
+
+def hover_point(browser, rng):
+    # Survol d'un point isolé de la figure affichée, ou d'un groupe s'il n'y en a pas
+    traces = (browser.props.get(("map-graph", "figure")) or {}).get("data", [])
+    for curve, trace in enumerate(traces):
+        ids = decode_array(trace.get("customdata"))
+        if len(ids):
+            point = rng.randrange(len(ids))
+            names = decode_array(trace.get("hovertext"))
+            return {"points": [{"curveNumber": curve, "pointNumber": point, "customdata": ids[point], "hovertext": names[point]}]}
+    return {"points": [{"curveNumber": 0, "pointNumber": 0, "hovertext": "startups"}]}
+
+
+def profile_trace(browser, rng, data, steps):
+    browser.navigate("/home")
+    for _ in range(steps):
+        cards = browser.matching('{"index":["ALL"],"type":"recommended-startup"}')
+        if cards and rng.random() < 0.6:
+            browser.click(rng.choice(cards))
+        else:
+            name = rng.choice(data["names"])
+            type_text(browser, "df-dropdown", name, rng)
+            browser.act({("df-dropdown", "value"): name})
+
+
+TRACES = {"dashboard": dashboard_trace, "carte": map_trace, "profil": profile_trace}
+
+
+def trace_data(store, rng):
+    # Valeurs tirées par les parcours, issues du jeu de données courant
+    societes = store.table("societes.csv")
+    counts = store.index("Sous-Catégorie").counts()
+    return {
+        "categories": sorted(counts, key=counts.get, reverse=True)[:40],
+        "names": rng.sample(sorted(societes["nom"].dropna().unique()), 200),
+        "effectifs": sorted(societes["Effectif_def"].dropna().unique()),
+        "years": (int(societes["annee_creation"].min()), int(societes["annee_creation"].max())),
+    }
+
+
+def start_app(cache_dir):
+    # Application dans le processus, cache partagé dans un répertoire vide
+    os.environ["STARTHUB_CACHE_DIR"] = cache_dir
+    import app
+    return app
+
+
+def run(sessions=20, steps=10, seed=0, traces=tuple(TRACES), warmup=1):
+    import metrics
+    from datastore import get_store
+
+    samples = defaultdict(list)  # nom -> [(secondes, octets)]
+    errors = defaultdict(int)
+
+    def record(name, seconds, size, status):
+        if status not in (200, 204):
+            errors[name] += 1
+        samples[name].append((seconds, size))
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        app = start_app(cache_dir)
+        client = app.server.test_client()
+        client.get("/")  # Configuration du serveur : callbacks des pages enregistrés
+        dependencies = client.get("/_dash-dependencies").get_json()
+        names = {dep["output"]: metrics.callback_name(app.app.callback_map[dep["output"]]["callback"]) for dep in dependencies}
+        data = trace_data(get_store(), random.Random(seed))
+
+        # Sessions de préchauffage (imports, chargements de pages) non comptées
+        for trace in traces:
+            for session in range(warmup):
+                rng = random.Random(f"{seed}:{trace}:warmup:{session}")
+                browser = Browser(client, dependencies, names, lambda *args: None)
+                browser.open("/")
+                TRACES[trace](browser, rng, data, steps)
+
+        start = time.perf_counter()
+        for session in range(sessions):
+            for trace in traces:
+                rng = random.Random(f"{seed}:{trace}:{session}")
+                browser = Browser(client, dependencies, names, record)
+                browser.open("/")
+                TRACES[trace](browser, rng, data, steps)
+        elapsed = time.perf_counter() - start
+
+    return {
+        "meta": {
+            "version_donnees": get_store().version,
+            "seed": seed,
+            "sessions": sessions,
+            "steps": steps,
+            "parcours": list(traces),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+        },
+        "requetes": sum(len(values) for values in samples.values()),
+        "duree_s": round(elapsed, 3),
+        "debit_rps": round(sum(len(values) for values in samples.values()) / elapsed, 1),
+        "callbacks": {name: summarize(values, errors[name]) for name, values in sorted(samples.items())},
+    }
+
+
+def summarize(values, errors):
+    seconds = np.array([value[0] for value in values]) * 1000
+    return {
+        "n": len(values),
+        "erreurs": errors,
+        "p50_ms": round(float(np.percentile(seconds, 50)), 2),
+        "p95_ms": round(float(np.percentile(seconds, 95)), 2),
+        "p99_ms": round(float(np.percentile(seconds, 99)), 2),
+        "max_ms": round(float(seconds.max()), 2),
+        "debit_rps": round(len(values) / (seconds.sum() / 1000), 1),  # Appels par seconde sur un seul thread
+        "octets_moyens": int(np.mean([value[1] for value in values])),
+    }
+
+
+def baseline_path(name):
+    from datastore.store import ARTIFACTS_DIR
+    return os.path.join(ARTIFACTS_DIR, "bench", f"{name}.json")
+
+
+def save_baseline(report, name):
+    path = baseline_path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    return path
+
+
+def compare(report, baseline, tolerance=TOLERANCE, floor_ms=FLOOR_MS):
+    # Callbacks dont le p95 dépasse la référence de plus de `tolerance` (et de plus de floor_ms)
+    if report["meta"] != baseline["meta"]:
+        print(f"Attention : conditions différentes de la référence {baseline['meta']}")
+    print(f"\n{'callback':<36}{'p95 réf. (ms)':>15}{'p95 (ms)':>12}{'écart':>10}")
+    regressions = []
+    for name, result in report["callbacks"].items():
+        reference = baseline["callbacks"].get(name)
+        if reference is None:
+            print(f"{name:<36}{'-':>15}{result['p95_ms']:>12.1f}")
+            continue
+        delta = result["p95_ms"] / reference["p95_ms"] - 1 if reference["p95_ms"] else 0.0
+        regressed = delta > tolerance and result["p95_ms"] - reference["p95_ms"] > floor_ms
+        print(f"{name:<36}{reference['p95_ms']:>15.1f}{result['p95_ms']:>12.1f}{delta:>+10.0%}{'  RÉGRESSION' if regressed else ''}")
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def print_report(report):
+    print(f"{report['requetes']} requêtes en {report['duree_s']}s : {report['debit_rps']} req/s")
+    print(f"{'callback':<36}{'n':>6}{'p50 (ms)':>10}{'p95 (ms)':>10}{'p99 (ms)':>10}{'max (ms)':>10}{'req/s':>9}{'octets':>10}")
+    for name, result in report["callbacks"].items():
+        print(f"{name:<36}{result['n']:>6}{result['p50_ms']:>10.1f}{result['p95_ms']:>10.1f}{result['p99_ms']:>10.1f}"
+              f"{result['max_ms']:>10.1f}{result['debit_rps']:>9.1f}{result['octets_moyens']:>10}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rejoue des parcours d'utilisateurs sur les callbacks Dash et mesure leurs latences")
+    parser.add_argument("--sessions", type=int, default=20, help="Sessions mesurées par parcours")
+    parser.add_argument("--steps", type=int, default=10, help="Actions par session")
+    parser.add_argument("--seed", type=int, default=0, help="Graine des parcours (même graine, mêmes requêtes)")
+    parser.add_argument("--warmup", type=int, default=1, help="Sessions de préchauffage non mesurées par parcours")
+    parser.add_argument("--parcours", nargs="+", choices=list(TRACES), default=list(TRACES))
+    parser.add_argument("--save-baseline", metavar="NOM", help="Enregistre le rapport comme référence")
+    parser.add_argument("--compare", metavar="NOM", help="Compare le p95 de chaque callback à une référence")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="Hausse relative du p95 tolérée")
+    args = parser.parse_args()
+
+    report = run(args.sessions, args.steps, args.seed, args.parcours, args.warmup)
+    print_report(report)
+    if args.save_baseline:
+        print(f"Référence enregistrée : {save_baseline(report, args.save_baseline)}")
+
+    failed = [name for name, result in report["callbacks"].items() if result["erreurs"]]
+    if failed:
+        print(f"Erreurs HTTP : {', '.join(failed)}")
+    if args.compare:
+        with open(baseline_path(args.compare), encoding="utf-8") as f:
+            failed += compare(report, json.load(f), args.tolerance)
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,67 @@
+# Comparaison des formats de chargement des tables : temps et mémoire d'un worker qui démarre
+#   python bench_snapshot.py [--repeat 3]
+# Chaque mesure est faite dans un processus neuf ; parquet et feather sont testés si pyarrow est installé
+import argparse
+import importlib.util
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+from datastore import snapshot
+from datastore.store import read_sources, source_version
+
+# Exécuté dans le processus de mesure : imports faits avant la mesure, seules les tables comptent
+CHILD = """
+import json, sys, time
+import psutil
+from datastore import snapshot
+from datastore.store import FILES, read_sources, source_version
+if sys.argv[1] in ("parquet", "feather"):
+    import pyarrow.feather, pyarrow.parquet
+
+process = psutil.Process()
+before = process.memory_full_info()
+start = time.perf_counter()
+if sys.argv[1] == "csv":
+    tables = read_sources()
+else:
+    tables = snapshot.read(FILES, sys.argv[2], source_version())
+elapsed = time.perf_counter() - start
+after = process.memory_full_info()
+print(json.dumps({"load_s": elapsed, "rss_mo": (after.rss - before.rss) / 1e6, "uss_mo": (after.uss - before.uss) / 1e6}))
+"""
+
+
+def measure(fmt, root, repeat):
+    runs = [
+        json.loads(subprocess.run([sys.executable, "-c", CHILD, fmt, root], capture_output=True, text=True, check=True).stdout)
+        for _ in range(repeat)
+    ]
+    return {key: round(statistics.median(run[key] for run in runs), 3) for key in runs[0]}
+
+
+def bench(repeat=3):
+    formats = ["npy"]
+    if importlib.util.find_spec("pyarrow") is not None:
+        formats += ["parquet", "feather"]
+
+    tables, version = read_sources(), source_version()
+    report = {"csv": measure("csv", "", repeat)}
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt in formats:
+            root = f"{tmp}/{fmt}"
+            snapshot.write(tables, root, version, fmt)
+            report[fmt] = measure(fmt, root, repeat)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Temps de chargement et mémoire par format d'instantané")
+    parser.add_argument("--repeat", type=int, default=3, help="Nombre de processus mesurés par format (médiane)")
+    args = parser.parse_args()
+    # rss : mémoire résidente ajoutée ; uss : part privée au processus (les pages projetées depuis
+    # un instantané sont partagées entre workers et ne comptent pas dans l'uss)
+    print(f"{'format':<10}{'chargement (s)':>16}{'rss (Mo)':>12}{'uss (Mo)':>12}")
+    for fmt, result in bench(args.repeat).items():
+        print(f"{fmt:<10}{result['load_s']:>16.3f}{result['rss_mo']:>12.1f}{result['uss_mo']:>12.1f}")
@@ -0,0 +1,28 @@
+# Job hors ligne : table des k plus proches voisins de chaque entreprise
+#   python build_recommendations.py [--full] [--k 13]
+# Par défaut, seules les entreprises nouvelles ou modifiées depuis la dernière table
+# (et celles dont un voisin a changé) sont recalculées
+import argparse
+import time
+from datastore import get_store, recommender
+
+
+def build(k=13, full=False):
+    start = time.perf_counter()
+    store = get_store()
+    table, recomputed = recommender.refresh(store.table("societes.csv"), store.version, k=k, full=full)
+    return {
+        "version": store.version,
+        "entreprises": len(table.ids),
+        "recalculees": recomputed,
+        "k": table.indices.shape[1],
+        "total_s": round(time.perf_counter() - start, 2),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Précalcule la table des recommandations de la page d'accueil")
+    parser.add_argument("--full", action="store_true", help="Recalcule toutes les entreprises")
+    parser.add_argument("--k", type=int, default=13, help="Nombre de voisins conservés par entreprise")
+    args = parser.parse_args()
+    print(build(args.k, args.full))
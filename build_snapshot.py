@@ -0,0 +1,29 @@
+# Conversion des csv en instantané binaire, relu par les workers au démarrage
+#   python build_snapshot.py [--format npy|parquet|feather]
+# À relancer après chaque mise à jour des csv : un instantané périmé est ignoré (lecture des csv)
+import argparse
+import os
+import time
+from datastore import snapshot
+from datastore.store import ASSETS_DIR, SNAPSHOT_DIR, read_sources, source_version
+
+
+def build(fmt="npy", assets_dir=ASSETS_DIR, root=SNAPSHOT_DIR):
+    start = time.perf_counter()
+    version = source_version(assets_dir)
+    directory = snapshot.write(read_sources(assets_dir), root, version, fmt)
+    size = sum(os.path.getsize(os.path.join(path, name)) for path, _, names in os.walk(directory) for name in names)
+    return {
+        "version": version,
+        "format": fmt,
+        "repertoire": directory,
+        "taille_mo": round(size / 1e6, 1),
+        "total_s": round(time.perf_counter() - start, 2),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convertit les csv en instantané binaire pour un démarrage rapide")
+    parser.add_argument("--format", choices=snapshot.FORMATS, default="npy", help="parquet et feather nécessitent pyarrow")
+    args = parser.parse_args()
+    print(build(args.format))
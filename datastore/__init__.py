@@ -0,0 +1,7 @@
+# Couche d'accès aux données partagée par l'application et les pages
+from datastore.index import InvertedIndex
+from datastore.keys import CompanyIndex
+from datastore.store import DataStore, get_store
+from datastore.filters import FilterResult, evaluate, filter_data, filter_key
+from datastore.result_cache import ResultCache
+from datastore.cube import Cube, CubeSlice, summarize
@@ -0,0 +1,100 @@
+# Cube d'agrégats du dashboard : sommes et comptages pré-calculés par combinaison de dimensions
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+
+ALL_CATEGORIES = ""  # Membre de la dimension catégorie qui regroupe toutes les entreprises (sans éclatement)
+
+# Deux tables de faits au grain différent : une ligne par entreprise, une ligne par levée de fonds
+COMPANY_DIMS = ["categorie", "annee_creation", "Effectif_def", "Nom Secteur"]
+COMPANY_MEASURES = ["entreprises", "financees"]
+ROUND_DIMS = ["categorie", "annee_creation", "Effectif_def", "Année", "Série"]
+ROUND_MEASURES = ["levees", "Montant_def"]
+
+# Agrégats correspondant à un filtre, sans la dimension catégorie
+CubeSlice = namedtuple("CubeSlice", ["companies", "rounds"])
+
+
+def company_facts(societes, financements):
+    # Une ligne par entreprise, avec les indicateurs dont le dashboard compte les entreprises distinctes
+    facts = societes[["annee_creation", "Effectif_def", "Nom Secteur"]].copy()
+    facts["entreprises"] = 1
+    # Entreprise financée : au moins une levée de montant connu et positif (financements.csv
+    # contient aussi une ligne vide par entreprise, sans date, série ni montant)
+    funded = financements.loc[financements["Montant_def"] > 0, "entreprise_id"]
+    facts["financees"] = societes["entreprise_id"].isin(funded).astype(np.int64)
+    return facts
+
+
+def round_facts(societes, financements):
+    # Une ligne par levée, avec les dimensions de l'entreprise ; `position` est sa ligne dans societes
+    companies = societes[["entreprise_id", "annee_creation", "Effectif_def"]].assign(position=np.arange(len(societes)))
+    facts = financements[["entreprise_id", "Année", "Série", "Montant_def"]].merge(companies, on="entreprise_id")
+    facts["levees"] = 1
+    return facts
+
+
+def aggregate(facts, dims, measures):
+    # Les valeurs manquantes restent des membres des dimensions : les filtres décident de les exclure
+    return facts.groupby(dims, dropna=False, observed=True, sort=False)[measures].sum().reset_index()
+
+
+def summarize(result):
+    # Agrégats calculés directement sur les lignes d'un résultat du moteur de filtres
+    companies = company_facts(result.societes, result.financements).assign(categorie=ALL_CATEGORIES)
+    rounds = round_facts(result.societes, result.financements).assign(categorie=ALL_CATEGORIES)
+    return CubeSlice(
+        aggregate(companies, COMPANY_DIMS, COMPANY_MEASURES).drop(columns="categorie"),
+        aggregate(rounds, ROUND_DIMS, ROUND_MEASURES).drop(columns="categorie"),
+    )
+
+
+class Cube:
+    """Agrégats par (catégorie, année de création, effectif, secteur | année de levée, série).
+
+    Une entreprise est comptée dans chacune de ses catégories et une fois dans ALL_CATEGORIES :
+    le cube répond aux filtres portant sur au plus une catégorie. Au-delà, l'union de catégories
+    demande un comptage d'entreprises distinctes et reste confiée au moteur de filtres.
+    """
+
+    def __init__(self, societes, financements, category_index):
+        companies = company_facts(societes, financements)
+        rounds = round_facts(societes, financements)
+
+        # Éclatement par catégorie à partir des listes de positions de l'index inversé
+        positions = np.concatenate([category_index.postings[token] for token in category_index.tokens])
+        categories = np.repeat(category_index.tokens, [len(category_index.postings[token]) for token in category_index.tokens])
+        membership = pd.DataFrame({"position": positions, "categorie": categories})
+
+        self.companies = self._by_category(pd.concat([
+            aggregate(companies.assign(categorie=ALL_CATEGORIES), COMPANY_DIMS, COMPANY_MEASURES),
+            aggregate(companies.iloc[positions].assign(categorie=categories), COMPANY_DIMS, COMPANY_MEASURES),
+        ], ignore_index=True))
+        self.rounds = self._by_category(pd.concat([
+            aggregate(rounds.assign(categorie=ALL_CATEGORIES), ROUND_DIMS, ROUND_MEASURES),
+            aggregate(rounds.merge(membership, on="position"), ROUND_DIMS, ROUND_MEASURES),
+        ], ignore_index=True))
+
+    @staticmethod
+    def _by_category(cells):
+        # Cellules rangées par catégorie : un filtre ne parcourt que celles de sa catégorie
+        return {category: group.drop(columns="categorie").reset_index(drop=True) for category, group in cells.groupby("categorie", sort=False)}
+
+    @staticmethod
+    def supports(key):
+        return len(key[0]) <= 1
+
+    def _select(self, cells, key):
+        categories, year_range, effectif = key
+        # Catégorie inconnue : aucune cellule, avec les colonnes attendues par le dashboard
+        cells = cells.get(categories[0] if categories else ALL_CATEGORIES, cells[ALL_CATEGORIES].iloc[:0])
+        mask = np.ones(len(cells), dtype=bool)
+        if effectif:
+            mask &= cells["Effectif_def"].isin(effectif).to_numpy()
+        if year_range:
+            mask &= cells["annee_creation"].between(year_range[0], year_range[1]).to_numpy()
+        return cells[mask]
+
+    def slice(self, key):
+        # `key` est la forme canonique d'un filtre (datastore.filters.filter_key)
+        return CubeSlice(self._select(self.companies, key), self._select(self.rounds, key))
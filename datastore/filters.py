@@ -0,0 +1,95 @@
+# Moteur de filtres commun à tous les callbacks du dashboard
+from collections import namedtuple
+from functools import lru_cache
+import hashlib
+import weakref
+import numpy as np
+from datastore.store import get_store
+
+# Lignes retenues par un filtre, mémoïsées : bitmaps compactés (1 bit par ligne de societes.csv
+# et de financements.csv, quelques Ko) et empreinte de l'ensemble retenu
+Selection = namedtuple("Selection", ["societes", "financements", "digest"])
+
+
+class FilterResult:
+    """Résultat d'un filtre : sous-ensembles des deux tables extraits à la
+    demande (une fois par résultat, jamais conservés par la mémoïsation), empreinte de l'ensemble
+    retenu (deux filtres différents peuvent donner la même empreinte) et forme canonique du filtre."""
+
+    def __init__(self, store, selection, key):
+        self.store = store
+        self.digest = selection.digest
+        self.key = key
+        self._selection = selection
+        self._societes = None
+        self._financements = None
+
+    def _rows(self, filename, bits):
+        df = self.store.table(filename)
+        return df[np.unpackbits(bits, count=len(df)).view(bool)]
+
+    @property
+    def societes(self):
+        if self._societes is None:
+            self._societes = self._rows("societes.csv", self._selection.societes)
+        return self._societes
+
+    @property
+    def financements(self):
+        if self._financements is None:
+            self._financements = self._rows("financements.csv", self._selection.financements)
+        return self._financements
+
+
+def filter_key(categories=None, year_range=None, effectif=None):
+    # Forme canonique et hashable du filtre : l'ordre de sélection n'a pas d'importance
+    return (
+        tuple(sorted(categories)) if categories else (),
+        (int(year_range[0]), int(year_range[1])) if year_range else None,
+        tuple(sorted(effectif)) if effectif else (),
+    )
+
+
+def societe_mask(store, key):
+    # Masque booléen (bitmap) sur les lignes de societes.csv
+    categories, year_range, effectif = key
+    df = store.table("societes.csv")
+    mask = np.ones(len(df), dtype=bool)
+    if categories:
+        mask &= store.index("Sous-Catégorie").mask(categories)  # Correspondance exacte, sans regex
+    if effectif:
+        mask &= df["Effectif_def"].isin(effectif).to_numpy()
+    if year_range:
+        mask &= df["annee_creation"].between(year_range[0], year_range[1]).to_numpy()  # Les NaN sont exclus
+    return mask
+
+
+def select(store, key):
+    mask = societe_mask(store, key)
+    ids = store.table("societes.csv")["entreprise_id"].to_numpy()[mask]
+    financement_mask = store.table("financements.csv")["entreprise_id"].isin(ids).to_numpy()
+
+    h = hashlib.blake2b(store.version.encode(), digest_size=12)
+    h.update(np.ascontiguousarray(ids).tobytes())
+    return Selection(np.packbits(mask), np.packbits(financement_mask), h.hexdigest())
+
+
+# Store de chaque version en cours d'évaluation : la mémoïsation calcule sur le store reçu par
+# evaluate, jamais sur celui publié entre-temps par un rechargement
+_stores = weakref.WeakValueDictionary()
+
+
+@lru_cache(maxsize=256)
+def _select_cached(version, key):
+    return select(_stores[version], key)
+
+
+def evaluate(store, key):
+    # Lignes retenues mémoïsées par (version du jeu de données, filtre) ; les sous-tables
+    # sont extraites par le résultat, sur ce même store
+    _stores[store.version] = store
+    return FilterResult(store, _select_cached(store.version, key), key)
+
+
+def filter_data(categories=None, year_range=None, effectif=None):
+    return evaluate(get_store(), filter_key(categories, year_range, effectif))
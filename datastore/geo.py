@@ -0,0 +1,122 @@
+# Index spatial des entreprises : regroupement serveur des points visibles sur la carte
+import math
+from collections import namedtuple
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088  # Rayon moyen, pour convertir les distances haversine (radians) en km
+MAPBOX_TILE_PX = 512  # Largeur du monde à zoom 0 pour mapbox
+CLUSTER_RADIUS_PX = 60  # Taille à l'écran d'une cellule de regroupement
+MAX_CLUSTER_ZOOM = 13  # À partir de ce zoom, tous les points visibles sont envoyés individuellement
+DEFAULT_VIEWPORT_PX = (800, 600)  # Taille supposée de la carte avant le premier événement relayout
+
+# Données à afficher pour une vue : groupes (position moyenne, effectif) et points isolés
+ViewportData = namedtuple("ViewportData", ["cluster_lat", "cluster_lon", "cluster_count", "points"])
+
+
+def degrees_per_pixel(zoom):
+    return 360 / (MAPBOX_TILE_PX * 2 ** zoom)
+
+
+def viewport(relayout_data, center, zoom, size=DEFAULT_VIEWPORT_PX):
+    # Emprise (sud, ouest, nord, est) et zoom de la carte à partir de son dernier relayoutData
+    relayout_data = relayout_data or {}
+    zoom = relayout_data.get("mapbox.zoom", zoom)
+    center = relayout_data.get("mapbox.center", center)
+
+    derived = relayout_data.get("mapbox._derived")
+    if derived and derived.get("coordinates"):
+        lons = [point[0] for point in derived["coordinates"]]
+        lats = [point[1] for point in derived["coordinates"]]
+        return (min(lats), min(lons), max(lats), max(lons)), zoom
+
+    # Sans coordonnées dérivées : emprise approchée depuis le centre et le zoom
+    half_lon = size[0] / 2 * degrees_per_pixel(zoom)
+    half_lat = size[1] / 2 * degrees_per_pixel(zoom) * math.cos(math.radians(center["lat"]))
+    return (center["lat"] - half_lat, center["lon"] - half_lon, center["lat"] + half_lat, center["lon"] + half_lon), zoom
+
+
+def is_viewport_change(relayout_data):
+    return bool(relayout_data) and any(key.startswith("mapbox") for key in relayout_data)
+
+
+class GridClusterIndex:
+    """Points triés par latitude : requête d'emprise par recherche dichotomique puis grille par zoom."""
+
+    def __init__(self, lat, lon):
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        rows = np.flatnonzero(~(np.isnan(lat) | np.isnan(lon)))
+        order = np.argsort(lat[rows], kind="stable")
+        self.rows = rows[order].astype(np.int32)  # Positions des lignes de societes.csv
+        self.lat = lat[self.rows]
+        self.lon = lon[self.rows]
+
+    def in_bounds(self, bounds, mask=None):
+        # Positions (dans les tableaux triés) des points de l'emprise, filtrés par `mask` éventuel
+        south, west, north, east = bounds
+        start = np.searchsorted(self.lat, south, side="left")
+        stop = np.searchsorted(self.lat, north, side="right")
+        selected = np.arange(start, stop)
+        selected = selected[(self.lon[selected] >= west) & (self.lon[selected] <= east)]
+        if mask is not None:
+            selected = selected[mask[self.rows[selected]]]
+        return selected
+
+    def clusters(self, bounds, zoom, mask=None):
+        selected = self.in_bounds(bounds, mask)
+        if zoom >= MAX_CLUSTER_ZOOM or len(selected) == 0:
+            empty = np.empty(0)
+            return ViewportData(empty, empty, np.empty(0, dtype=np.int64), self.rows[selected])
+
+        # Cellule de grille dont la taille à l'écran est constante quel que soit le zoom
+        cell = CLUSTER_RADIUS_PX * degrees_per_pixel(zoom)
+        lat, lon = self.lat[selected], self.lon[selected]
+        keys = (np.floor(lat / cell).astype(np.int64) << 32) + np.floor(lon / cell).astype(np.int64)
+        _, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+
+        single = counts[inverse] == 1
+        grouped = counts > 1
+        cluster_lat = np.bincount(inverse, weights=lat)[grouped] / counts[grouped]
+        cluster_lon = np.bincount(inverse, weights=lon)[grouped] / counts[grouped]
+        return ViewportData(cluster_lat, cluster_lon, counts[grouped], self.rows[selected[single]])
+
+
+class NearbyIndex:
+    """BallTree haversine : k plus proches voisins et entreprises dans un rayon autour d'un point."""
+
+    def __init__(self, lat, lon):
+        from sklearn.neighbors import BallTree  # Import lourd limité aux requêtes géographiques
+
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        self.rows = np.flatnonzero(~(np.isnan(lat) | np.isnan(lon))).astype(np.int32)
+        self.tree = BallTree(np.radians(np.column_stack([lat[self.rows], lon[self.rows]])), metric="haversine")
+
+    def _point(self, lat, lon):
+        return np.radians([[lat, lon]])
+
+    def nearest(self, lat, lon, k=10, mask=None):
+        # Positions des k entreprises les plus proches (parmi celles de `mask`) et distances en km
+        n_points = len(self.rows)
+        query_k = min(k, n_points)
+        while True:
+            distances, found = self.tree.query(self._point(lat, lon), k=query_k)
+            rows, distances = self.rows[found[0]], distances[0]
+            if mask is not None:
+                keep = mask[rows]
+                rows, distances = rows[keep], distances[keep]
+            # Filtre trop sélectif : on élargit la recherche jusqu'à trouver k entreprises
+            if len(rows) >= k or query_k == n_points:
+                return rows[:k], distances[:k] * EARTH_RADIUS_KM
+            query_k = min(query_k * 4, n_points)
+
+    def within(self, lat, lon, radius_km, mask=None):
+        # Positions des entreprises à moins de `radius_km`, de la plus proche à la plus éloignée
+        found, distances = self.tree.query_radius(
+            self._point(lat, lon), r=radius_km / EARTH_RADIUS_KM, return_distance=True, sort_results=True
+        )
+        rows, distances = self.rows[found[0]], distances[0]
+        if mask is not None:
+            keep = mask[rows]
+            rows, distances = rows[keep], distances[keep]
+        return rows, distances * EARTH_RADIUS_KM
@@ -0,0 +1,46 @@
+# Index inversé : token -> liste triée des positions de lignes qui le contiennent
+import numpy as np
+import pandas as pd
+
+
+class InvertedIndex:
+    """Index exact sur une colonne de valeurs multiples séparées par `sep`."""
+
+    def __init__(self, values, sep):
+        self.size = len(values)
+        tokens = pd.Series(np.asarray(values, dtype=object)).str.split(sep).explode().str.strip()
+        tokens = tokens[tokens.notna() & (tokens != "")]
+        # L'index de la série éclatée est la position de la ligne d'origine
+        self.postings = {
+            token: np.unique(positions.to_numpy().astype(np.int32))
+            for token, positions in tokens.groupby(tokens, sort=True).groups.items()
+        }
+        self.tokens = list(self.postings)
+
+    def lookup(self, token):
+        return self.postings.get(token, np.empty(0, dtype=np.int32))
+
+    def any(self, tokens):
+        # Union des listes : lignes contenant au moins un des tokens
+        postings = [self.lookup(token) for token in tokens]
+        if not postings:
+            return np.empty(0, dtype=np.int32)
+        return np.unique(np.concatenate(postings))
+
+    def all(self, tokens):
+        # Intersection des listes, en partant de la plus courte
+        postings = sorted((self.lookup(token) for token in tokens), key=len)
+        if not postings:
+            return np.empty(0, dtype=np.int32)
+        result = postings[0]
+        for positions in postings[1:]:
+            result = np.intersect1d(result, positions, assume_unique=True)
+        return result
+
+    def mask(self, tokens, mode="any"):
+        mask = np.zeros(self.size, dtype=bool)
+        mask[self.all(tokens) if mode == "all" else self.any(tokens)] = True
+        return mask
+
+    def counts(self):
+        return {token: len(positions) for token, positions in self.postings.items()}
@@ -0,0 +1,52 @@
+# Index de clés de societes.csv : entreprise_id et nom vers la position de la ligne,
+# et regroupement par entreprise des tables qui la référencent (financements, personnes)
+import numpy as np
+import pandas as pd
+
+
+class CompanyIndex:
+    """Accès direct (table de hachage) aux lignes par entreprise_id, et par nom avec les homonymes."""
+
+    def __init__(self, ids, names):
+        self.ids = pd.Index(np.asarray(ids))
+        if not self.ids.is_unique:
+            raise ValueError("entreprise_id doit être unique dans societes.csv")
+        # nom -> positions croissantes des lignes portant ce nom
+        self.names = pd.Series(np.arange(len(self.ids))).groupby(np.asarray(names, dtype=object), sort=False).indices
+
+    def row(self, entreprise_id):
+        # Position de l'entreprise, ou None si l'identifiant est inconnu
+        try:
+            return int(self.ids.get_loc(entreprise_id))
+        except KeyError:
+            return None
+
+    def rows(self, entreprise_ids):
+        # Positions de plusieurs entreprises en une passe, -1 pour les identifiants inconnus
+        return self.ids.get_indexer(np.asarray(entreprise_ids))
+
+    def rows_by_name(self, nom):
+        # Toutes les entreprises portant ce nom, dans l'ordre de la table
+        return self.names.get(nom, np.empty(0, dtype=np.int64))
+
+    def id_by_name(self, nom):
+        # Premier entreprise_id portant ce nom, ou None
+        rows = self.rows_by_name(nom)
+        return self.ids[rows[0]].item() if len(rows) else None
+
+
+class GroupIndex:
+    """Lignes d'une table fille regroupées par entreprise (format CSR) : positions triées et bornes."""
+
+    def __init__(self, company_rows, n_companies):
+        # company_rows : position dans societes.csv de l'entreprise de chaque ligne, -1 si inconnue
+        company_rows = np.asarray(company_rows)
+        known = np.flatnonzero(company_rows >= 0)
+        # Tri stable : les lignes d'une entreprise gardent l'ordre du fichier
+        self.order = known[np.argsort(company_rows[known], kind="stable")]
+        self.offsets = np.zeros(n_companies + 1, dtype=np.int64)
+        np.cumsum(np.bincount(company_rows[known], minlength=n_companies), out=self.offsets[1:])
+
+    def rows(self, company_row):
+        # Positions des lignes de l'entreprise dans la table fille
+        return self.order[self.offsets[company_row]:self.offsets[company_row + 1]]
@@ -0,0 +1,25 @@
+# Comptage des mots-clés : matrice creuse entreprises x mots-clés, sommée pour n'importe quel filtre
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+class KeywordCounts:
+    """Nombre d'occurrences de chaque mot-clé par ligne de societes.csv."""
+
+    def __init__(self, values, sep=","):
+        tokens = pd.Series(np.asarray(values, dtype=object)).str.split(sep).explode().str.strip()
+        tokens = tokens[tokens.notna() & (tokens != "")]
+        codes, vocabulary = pd.factorize(tokens, sort=True)
+        self.vocabulary = np.asarray(vocabulary, dtype=object)
+        # Les doublons (ligne, mot-clé) sont additionnés à la construction de la matrice
+        self.matrix = sparse.csr_matrix(
+            (np.ones(len(codes), dtype=np.int32), (tokens.index.to_numpy(), codes)),
+            shape=(len(values), len(self.vocabulary)),
+        )
+
+    def frequencies(self, rows):
+        # {mot-clé: occurrences} sur les lignes `rows`, sans les mots-clés absents
+        counts = np.asarray(self.matrix[rows].sum(axis=0)).ravel()
+        present = np.flatnonzero(counts)
+        return dict(zip(self.vocabulary[present].tolist(), counts[present].tolist()))
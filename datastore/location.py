@@ -0,0 +1,74 @@
+# Index des adresses : recherche par préfixe insensible à la casse et aux accents
+import re
+import unicodedata
+import numpy as np
+import pandas as pd
+
+POSTCODE_CITY = re.compile(r"(\d{5})\s+(.+)$")  # "... 42000 Saint-Étienne"
+
+
+def fold(text):
+    # Minuscules sans accents, ponctuation et tirets remplacés par des espaces
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return re.sub(r"[^0-9a-z]+", " ", text.lower()).strip()
+
+
+def prefix_range(keys, prefix):
+    # Tranche [start, stop) des clés triées commençant par `prefix`
+    return np.searchsorted(keys, prefix, side="left"), np.searchsorted(keys, prefix + "\uffff", side="left")
+
+
+class LocationIndex:
+    """Tokens d'adresse triés avec listes de positions contiguës : un préfixe = une tranche."""
+
+    def __init__(self, addresses):
+        addresses = pd.Series(np.asarray(addresses, dtype=object)).fillna("")
+        self.size = len(addresses)
+
+        # Un token par mot de l'adresse normalisée : "Saint-Étienne" donne "saint" et "etienne"
+        tokens = addresses.map(fold).str.split().explode()
+        tokens = tokens[tokens.notna() & (tokens != "")]
+        pairs = tokens.rename("token").rename_axis("position").reset_index().drop_duplicates()
+        # Tri par (token, position) : les positions d'un même préfixe forment une tranche unique
+        pairs = pairs.sort_values(["token", "position"], ignore_index=True)
+        sorted_tokens = pairs["token"].to_numpy()
+        self.positions = pairs["position"].to_numpy().astype(np.int32)
+        self.keys, starts = np.unique(sorted_tokens, return_index=True)
+        self.keys = self.keys.astype(str)
+        self.offsets = np.append(starts, len(sorted_tokens)).astype(np.int64)
+
+        # Villes proposées en autocomplétion, classées par nombre d'entreprises
+        parts = addresses.str.extract(POSTCODE_CITY)
+        cities = pd.DataFrame({"postcode": parts[0], "city": parts[1], "key": parts[1].dropna().map(fold)}).dropna()
+        cities = cities.groupby(["key", "city", "postcode"]).size().rename("count").reset_index()
+        self.cities = cities.sort_values(["count", "city"], ascending=[False, True], ignore_index=True)
+
+    def prefix(self, prefix):
+        # Positions des lignes ayant un token commençant par `prefix` (déjà normalisé)
+        start, stop = prefix_range(self.keys, prefix)
+        return np.unique(self.positions[self.offsets[start]:self.offsets[stop]])
+
+    def search(self, query):
+        # Chaque mot de la requête doit préfixer un token de l'adresse
+        words = fold(query).split()
+        if not words:
+            return np.arange(self.size, dtype=np.int32)
+        postings = sorted((self.prefix(word) for word in words), key=len)
+        result = postings[0]
+        for positions in postings[1:]:
+            result = np.intersect1d(result, positions, assume_unique=True)
+        return result
+
+    def mask(self, query):
+        mask = np.zeros(self.size, dtype=bool)
+        mask[self.search(query)] = True
+        return mask
+
+    def suggest(self, query, limit=8):
+        # Villes dont le nom ou le code postal commence par la requête, les plus représentées d'abord
+        query = fold(query)
+        if not query:
+            return []
+        matches = self.cities[self.cities["key"].str.startswith(query) | self.cities["postcode"].str.startswith(query)]
+        return [f"{row.city} ({row.postcode})" for row in matches.head(limit).itertuples()]
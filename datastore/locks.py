@@ -0,0 +1,46 @@
+# Verrou exclusif entre processus (workers gunicorn, serveur de développement multithread),
+# porté par un fichier : libéré par le système si le processus qui le détient s'arrête
+import os
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+def _try_lock(f):
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+def _unlock(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def file_lock(path, blocking=True, poll=0.1):
+    # Renvoie True si le verrou est acquis ; sans attente (blocking=False), False s'il est déjà pris
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "a+b") as f:
+        acquired = _try_lock(f)
+        while blocking and not acquired:
+            time.sleep(poll)
+            acquired = _try_lock(f)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                _unlock(f)
@@ -0,0 +1,59 @@
+# Colonnes dérivées calculées une seule fois au chargement des tables
+
+# À incrémenter à chaque changement des colonnes dérivées : invalide les instantanés existants
+NORMALIZE_VERSION = 1
+
+# Dictionnaire des secteurs d'activité (codes NAF partiels)
+DICT_SECTEURS = {
+    '01': 'Agriculture',
+    '02': 'Sylviculture et exploitation forestière',
+    '03': 'Pêche et aquaculture',
+    '05': 'Extraction de houille et de lignite',
+    '08': 'Autres industries extractives',
+    '10': 'Industries alimentaires',
+    '13': 'Fabrication de textiles',
+    '18': 'Imprimerie et reproduction d\'enregistrements',
+    '26': 'Fabrication de produits informatiques et électroniques',
+    '32': 'Autres industries manufacturières',
+    '41': 'Construction de bâtiments',
+    '43': 'Travaux de construction spécialisés',
+    '49': 'Transports terrestres et transport par conduites',
+    '56': 'Restauration',
+    '58': 'Édition',
+    '61': 'Télécommunications',
+    '62': 'Programmation, conseil et autres activités informatiques',
+    '63': 'Services d’information',
+    '64': 'Activités financières et d’assurance',
+    '68': 'Activités immobilières',
+    '70': 'Activités des sièges sociaux, conseil en gestion',
+    '71': 'Ingénierie et études techniques',
+    '72': 'Recherche et développement scientifique',
+    '73': 'Publicité et études de marché',
+    '74': 'Autres activités spécialisées, scientifiques et techniques',
+    '77': 'Location et exploitation de biens immobiliers',
+    '82': 'Activités administratives et autres services de soutien'
+}
+
+
+def normalize_societes(df):
+    df["annee_creation"] = df["date_creation_def"].dt.year  # Extraire l'année
+    # Secteur : 2 premiers chiffres du code de l'activité principale, puis libellé NAF
+    df["Secteur"] = df["Activité principale"].str[:2]
+    df["Nom Secteur"] = df["Secteur"].map(DICT_SECTEURS)
+    return df
+
+
+def normalize_financements(df):
+    df["Année"] = df["Date dernier financement"].dt.year
+    return df
+
+
+NORMALIZERS = {
+    "societes.csv": normalize_societes,
+    "financements.csv": normalize_financements,
+}
+
+
+def normalize(filename, df):
+    normalizer = NORMALIZERS.get(filename)
+    return normalizer(df) if normalizer else df
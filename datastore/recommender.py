@@ -0,0 +1,298 @@
+# Recommandation par plus proches voisins : matrice creuse de caractéristiques
+# et table des k voisins précalculée, persistée puis relue en mémoire mappée
+import json
+import os
+import shutil
+import tempfile
+import threading
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from datastore.locks import file_lock
+from datastore.store import ARTIFACTS_DIR
+
+# Colonnes utilisées comme caractéristiques, avec leur séparateur
+FEATURE_COLUMNS = {
+    "mots_cles_def": ", ",
+    "market": ", ",
+    "Activité principale": ", ",
+}
+
+
+def build_features(df, vocabularies=None, extend=False):
+    # Une ligne par entreprise : les lignes dupliquées (ex : après fusion avec les
+    # financements) gonfleraient la matrice et produiraient des voisins identiques
+    df = df.drop_duplicates("entreprise_id").reset_index(drop=True)
+
+    # Indicatrices (0/1) de chaque token par colonne, directement en CSR sans matrice dense.
+    # Un vocabulaire fourni est réutilisé tel quel : tokens inconnus ignorés, ou ajoutés
+    # en fin de vocabulaire avec extend=True (les colonnes existantes gardent leur position)
+    blocks, built_vocabularies = [], {}
+    for col, sep in FEATURE_COLUMNS.items():
+        tokens = df[col].str.split(sep).explode()
+        tokens = tokens[tokens.notna() & (tokens != "")]
+        if vocabularies is None:
+            codes, vocabulary = pd.factorize(tokens, sort=True)
+            vocabulary = list(vocabulary)
+        else:
+            vocabulary = list(vocabularies[col])
+            if extend:
+                vocabulary += sorted(set(tokens.unique()) - set(vocabulary))
+            codes = pd.Categorical(tokens, categories=vocabulary).codes
+        known = codes >= 0
+        block = sparse.csr_matrix(
+            (np.ones(known.sum(), dtype=np.uint8), (tokens.index.to_numpy()[known], codes[known])),
+            shape=(len(df), len(vocabulary)),
+        )
+        block.sum_duplicates()
+        block.data[:] = 1  # Un token répété dans une même ligne reste une indicatrice
+        blocks.append(block)
+        built_vocabularies[col] = vocabulary
+
+    X = sparse.hstack(blocks, format="csr", dtype=np.uint8)
+    X.indices = X.indices.astype(np.int32, copy=False)
+    X.indptr = X.indptr.astype(np.int32, copy=False)
+    return X, built_vocabularies, df["entreprise_id"].to_numpy()
+
+
+def feature_hashes(df):
+    # Empreinte des caractéristiques de chaque entreprise (même ordre que build_features),
+    # indépendante du vocabulaire : sert à détecter les lignes modifiées
+    df = df.drop_duplicates("entreprise_id").reset_index(drop=True)
+    parts = [
+        df[col].fillna("").map(lambda value, sep=sep: "\x1f".join(sorted({t for t in value.split(sep) if t})))
+        for col, sep in FEATURE_COLUMNS.items()
+    ]
+    return pd.util.hash_pandas_object(pd.concat(parts, axis=1), index=False).to_numpy()
+
+
+def _smallest(candidates, dist, k):
+    # Les k plus petites distances de chaque ligne, triées
+    nearest = np.argpartition(dist, k - 1, axis=1)[:, :k]
+    nearest_dist = np.take_along_axis(dist, nearest, axis=1)
+    order = np.argsort(nearest_dist, axis=1, kind="stable")
+    return np.take_along_axis(np.take_along_axis(candidates, nearest, axis=1), order, axis=1), \
+        np.take_along_axis(nearest_dist, order, axis=1)
+
+
+class _Distances:
+    # Distance de Manhattan exacte entre vecteurs binaires : |a| + |b| - 2 |a ∩ b|
+    def __init__(self, X):
+        self.X = X.tocsr().astype(np.float32)
+        self.norms = np.asarray(self.X.sum(axis=1)).ravel()
+        self.XT = self.X.T.tocsc()
+
+    def rows(self, rows):
+        overlap = (self.X[rows] @ self.XT).toarray()
+        return self.norms[rows, None] + self.norms[None, :] - 2 * overlap
+
+
+def top_k_neighbours(X, k, rows=None, block_size=1024):
+    # Voisins de toutes les lignes (ou des lignes `rows`), par blocs pour borner la mémoire
+    distances_of = X if isinstance(X, _Distances) else _Distances(X)
+    n = distances_of.X.shape[0]
+    k = min(k, n)
+    rows = np.arange(n) if rows is None else np.asarray(rows)
+
+    indices = np.empty((len(rows), k), dtype=np.int32)
+    distances = np.empty((len(rows), k), dtype=np.float32)
+    all_rows = np.broadcast_to(np.arange(n, dtype=np.int32), (min(block_size, len(rows)), n))
+    for start in range(0, len(rows), block_size):
+        block = rows[start:start + block_size]
+        indices[start:start + len(block)], distances[start:start + len(block)] = _smallest(
+            all_rows[:len(block)], distances_of.rows(block), k
+        )
+    return indices, distances
+
+
+class NeighbourTable:
+    """Table des k plus proches voisins de chaque entreprise : lecture en O(1)."""
+
+    def __init__(self, indices, distances, ids, vocabularies=None, hashes=None):
+        self.indices = indices  # Positions des voisins (lignes de la table)
+        self.distances = distances
+        self.ids = ids  # entreprise_id de chaque ligne
+        self.vocabularies = vocabularies  # Vocabulaire des caractéristiques, réutilisable
+        self.hashes = hashes  # Empreinte des caractéristiques de chaque ligne (mise à jour incrémentale)
+        self._rows = None
+
+    def row_of(self, entreprise_id):
+        if self._rows is None:
+            self._rows = {int(entreprise_id): row for row, entreprise_id in enumerate(self.ids)}
+        return self._rows.get(int(entreprise_id))
+
+    def neighbours(self, entreprise_id):
+        # entreprise_id et distances des voisins (l'entreprise elle-même incluse)
+        row = self.row_of(entreprise_id)
+        if row is None:
+            return np.empty(0, dtype=self.ids.dtype), np.empty(0, dtype=np.float32)
+        return self.ids[self.indices[row]], self.distances[row]
+
+    def save(self, directory):
+        # Écriture dans un répertoire temporaire puis renommage : jamais de table partielle.
+        # Une table déjà publiée pour ce répertoire est conservée (même version, même contenu)
+        parent = os.path.dirname(os.path.abspath(directory))
+        os.makedirs(parent, exist_ok=True)
+        tmp = tempfile.mkdtemp(dir=parent)
+        np.save(os.path.join(tmp, "indices.npy"), self.indices)
+        np.save(os.path.join(tmp, "distances.npy"), self.distances)
+        np.save(os.path.join(tmp, "ids.npy"), self.ids)
+        np.save(os.path.join(tmp, "hashes.npy"), self.hashes)
+        with open(os.path.join(tmp, "vocabulary.json"), "w", encoding="utf-8") as f:
+            json.dump(self.vocabularies or {}, f, ensure_ascii=False)
+        try:
+            os.replace(tmp, directory)
+        except OSError:
+            if not os.path.exists(os.path.join(directory, "hashes.npy")):
+                raise
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    @classmethod
+    def load(cls, directory, mmap_mode="r"):
+        with open(os.path.join(directory, "vocabulary.json"), encoding="utf-8") as f:
+            vocabularies = json.load(f)
+        return cls(
+            np.load(os.path.join(directory, "indices.npy"), mmap_mode=mmap_mode),
+            np.load(os.path.join(directory, "distances.npy"), mmap_mode=mmap_mode),
+            np.load(os.path.join(directory, "ids.npy"), mmap_mode=mmap_mode),
+            vocabularies,
+            np.load(os.path.join(directory, "hashes.npy"), mmap_mode=mmap_mode),
+        )
+
+
+# Au-delà de cette part de lignes modifiées, un recalcul complet est plus simple et aussi rapide
+MAX_INCREMENTAL_FRACTION = 0.25
+
+
+def build_table(df, k):
+    X, vocabularies, ids = build_features(df)
+    return NeighbourTable(*top_k_neighbours(X, k), ids, vocabularies, feature_hashes(df))
+
+
+def update_table(previous, df, k):
+    # Mise à jour incrémentale : seules les lignes nouvelles ou modifiées sont recalculées,
+    # ainsi que les lignes dont un voisin a changé ; les autres fusionnent leur ancienne liste
+    # avec les distances aux lignes modifiées. Renvoie (table, nombre de lignes recalculées)
+    X, vocabularies, ids = build_features(df, previous.vocabularies, extend=True)
+    hashes = feature_hashes(df)
+    n = len(ids)
+    k = min(k, n)
+    if previous.indices.shape[1] != k:
+        return build_table(df, k), n
+
+    previous_rows = {int(entreprise_id): row for row, entreprise_id in enumerate(previous.ids)}
+    old_row = np.array([previous_rows.get(int(entreprise_id), -1) for entreprise_id in ids])
+    unchanged = old_row >= 0
+    unchanged[unchanged] = np.asarray(previous.hashes)[old_row[unchanged]] == hashes[unchanged]
+    changed = np.flatnonzero(~unchanged)
+    if len(changed) > n * MAX_INCREMENTAL_FRACTION:
+        return build_table(df, k), n
+
+    # Anciennes listes de voisins exprimées en nouvelles positions (-1 : voisin modifié ou supprimé)
+    old_to_new = np.full(len(previous.ids), -1, dtype=np.int64)
+    old_to_new[old_row[unchanged]] = np.flatnonzero(unchanged)
+    kept = np.flatnonzero(unchanged)
+    kept_indices = old_to_new[np.asarray(previous.indices)[old_row[kept]]]
+    lost = (kept_indices < 0).any(axis=1)
+
+    indices = np.empty((n, k), dtype=np.int32)
+    distances = np.empty((n, k), dtype=np.float32)
+    distances_of = _Distances(X)
+
+    merge = kept[~lost]
+    if len(merge):
+        candidates = kept_indices[~lost]
+        candidate_dist = np.asarray(previous.distances)[old_row[merge]]
+        if len(changed):
+            # Distances symétriques : les lignes modifiées contre toutes les autres
+            changed_dist = distances_of.rows(changed)[:, merge].T
+            candidates = np.hstack([candidates, np.broadcast_to(changed, (len(merge), len(changed)))])
+            candidate_dist = np.hstack([candidate_dist, changed_dist])
+        indices[merge], distances[merge] = _smallest(candidates, candidate_dist, k)
+
+    recompute = np.union1d(changed, kept[lost])
+    if len(recompute):
+        indices[recompute], distances[recompute] = top_k_neighbours(distances_of, k, rows=recompute)
+    return NeighbourTable(indices, distances, ids, vocabularies, hashes), len(recompute)
+
+
+def _latest_pointer(root):
+    return os.path.join(root, "LATEST")
+
+
+def refresh(df, version, k=13, full=False, root=None):
+    # Table de la version demandée : relue si déjà calculée, sinon dérivée de la dernière
+    # table disponible (mise à jour incrémentale) ou recalculée entièrement.
+    # Renvoie (table, nombre de lignes recalculées)
+    root = root or os.path.join(ARTIFACTS_DIR, "recommender")
+    directory = os.path.join(root, version)
+    if not full and os.path.exists(os.path.join(directory, "hashes.npy")):
+        return NeighbourTable.load(directory), 0
+
+    # Un seul calcul à la fois : les autres processus attendent puis relisent la table publiée
+    with file_lock(os.path.join(root, ".lock")):
+        if not full and os.path.exists(os.path.join(directory, "hashes.npy")):
+            return NeighbourTable.load(directory), 0
+        return _build_and_publish(df, version, k, full, root, directory)
+
+
+def _build_and_publish(df, version, k, full, root, directory):
+    previous = None
+    if not full and os.path.exists(_latest_pointer(root)):
+        with open(_latest_pointer(root), encoding="utf-8") as f:
+            previous_dir = os.path.join(root, f.read().strip())
+        if os.path.exists(os.path.join(previous_dir, "hashes.npy")):
+            previous = NeighbourTable.load(previous_dir)
+
+    if previous is None:
+        table, recomputed = build_table(df, k), len(df)
+    else:
+        table, recomputed = update_table(previous, df, k)
+    if full and os.path.exists(directory):
+        shutil.rmtree(directory)  # Recalcul demandé explicitement : la table existante est remplacée
+    table.save(directory)
+
+    # Pointeur vers la dernière table, remplacé atomiquement (nom temporaire propre à ce processus)
+    fd, tmp_pointer = tempfile.mkstemp(dir=root, prefix="LATEST.")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(tmp_pointer, _latest_pointer(root))
+    return NeighbourTable.load(directory), recomputed
+
+
+_published = {}  # version -> table relue (une seule version conservée)
+_building = set()  # Versions en cours de calcul en arrière-plan dans ce processus
+_published_lock = threading.Lock()
+
+
+def published(df, version, k=13, root=None):
+    # Table de la version lue depuis le disque, sans jamais la calculer dans la requête.
+    # Absente (build_recommendations.py ou le préchauffage gunicorn non lancés) : None, et
+    # calcul lancé une fois en arrière-plan ; les requêtes suivantes la relisent une fois publiée
+    table = _published.get(version)
+    if table is not None:
+        return table
+    root = root or os.path.join(ARTIFACTS_DIR, "recommender")
+    directory = os.path.join(root, version)
+    with _published_lock:
+        if os.path.exists(os.path.join(directory, "hashes.npy")):
+            _published.clear()
+            table = _published[version] = NeighbourTable.load(directory)
+            return table
+        if version not in _building:
+            _building.add(version)
+            print(f"Table des recommandations absente (version {version}) : calcul en arrière-plan, "
+                  "lancer build_recommendations.py avant le démarrage", flush=True)
+            threading.Thread(target=_build_in_background, args=(df, version, k, root),
+                             name="starthub-recommender", daemon=True).start()
+    return None
+
+
+def _build_in_background(df, version, k, root):
+    try:
+        refresh(df, version, k, root=root)
+    except Exception as exc:
+        print(f"Calcul de la table des recommandations impossible : {exc!r}", flush=True)
+    finally:
+        with _published_lock:
+            _building.discard(version)
@@ -0,0 +1,61 @@
+# Surveillance des csv : reconstruction en arrière-plan puis bascule vers la nouvelle version
+# Un seul surveillant par déploiement : le serveur de développement, ou le maître gunicorn qui
+# renouvelle ensuite ses workers (gunicorn.conf.py)
+import os
+import threading
+from datastore.store import get_store, reload_store, source_version
+
+WATCH_INTERVAL = float(os.environ.get("STARTHUB_WATCH_INTERVAL", 5))  # En secondes, 0 désactive la surveillance
+
+
+class DatasetWatcher(threading.Thread):
+    """Compare périodiquement la version des csv à celle du store publié et recharge si besoin.
+
+    Une nouvelle version n'est chargée qu'après être restée identique pendant un intervalle complet,
+    pour ne pas lire un fichier en cours d'écriture. Les caches étant indexés par version, ceux de
+    l'ancienne version ne sont plus consultés dès la bascule ; `on_reload(store)` permet de
+    préchauffer ceux de la nouvelle.
+    """
+
+    def __init__(self, interval=WATCH_INTERVAL, on_reload=None):
+        super().__init__(name="starthub-watcher", daemon=True)
+        self.interval = interval
+        self.on_reload = on_reload
+        self._pending = None
+        self._stopped = threading.Event()
+
+    def check(self):
+        # Renvoie le nouveau store si une version a été publiée, None sinon
+        store = get_store()
+        version = source_version(store.assets_dir)
+        if version == store.version:
+            self._pending = None
+            return None
+        if version != self._pending:
+            self._pending = version  # Modification détectée : on attend qu'elle soit terminée
+            return None
+
+        self._pending = None
+        store = reload_store()
+        print(f"Données rechargées : version {store.version} ({store.source})", flush=True)
+        if self.on_reload:
+            self.on_reload(store)
+        return store
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.check()
+            except Exception as exc:  # Fichier illisible ou en cours de remplacement : l'ancienne version reste servie
+                print(f"Rechargement des données impossible : {exc!r}", flush=True)
+
+    def stop(self):
+        self._stopped.set()
+
+
+def start_watcher(on_reload=None, interval=WATCH_INTERVAL):
+    if interval <= 0:
+        return None
+    watcher = DatasetWatcher(interval, on_reload)
+    watcher.start()
+    return watcher
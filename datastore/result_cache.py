@@ -0,0 +1,79 @@
+# Cache des résultats calculés (indicateurs, figures) indexé par l'état normalisé des filtres
+from collections import OrderedDict
+import hashlib
+import json
+import pickle
+import threading
+
+
+class ResultCache:
+    """Cache LRU borné en nombre d'entrées et en octets, adossé à un backend flask_caching partagé."""
+
+    def __init__(self, backend=None, max_entries=256, max_bytes=128 * 1024 * 1024, timeout=24 * 3600):
+        self.backend = backend  # Partagé entre workers (ex : cache filesystem), optionnel
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self._entries = OrderedDict()  # clé -> (valeur, taille en octets)
+        self._bytes = 0
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(namespace, version, key):
+        # Empreinte canonique : la version du jeu de données fait partie de la clé,
+        # un changement de csv invalide donc automatiquement toutes les entrées
+        payload = json.dumps([namespace, version, key], sort_keys=True, default=list, ensure_ascii=False)
+        return f"{namespace}:{version}:{hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()}"
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+
+        value = self.backend.get(key) if self.backend is not None else None
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._store_local(key, value, len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL)))
+        return value
+
+    def set(self, key, value):
+        size = len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+        self._store_local(key, value, size)
+        if self.backend is not None:
+            self.backend.set(key, value, timeout=self.timeout)
+
+    def get_or_build(self, key, build):
+        value = self.get(key)
+        if value is None:
+            value = build()
+            self.set(key, value)
+        return value
+
+    def _store_local(self, key, value, size):
+        if size > self.max_bytes:
+            return  # Trop volumineux pour le cache local, reste disponible via le backend
+        version = key.split(":")[1]
+        with self._lock:
+            if version != self._version:
+                # Nouvelle version du jeu de données : les entrées locales sont obsolètes
+                self._entries.clear()
+                self._bytes = 0
+                self._version = version
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "hits": self.hits, "misses": self.misses}
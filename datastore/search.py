@@ -0,0 +1,66 @@
+# Recherche dans une liste de libellés (noms d'entreprises, catégories) pour les listes déroulantes
+import numpy as np
+from datastore.location import fold, prefix_range
+
+DEFAULT_LIMIT = 20  # Nombre d'options renvoyées au navigateur
+MIN_SIMILARITY = 0.3  # Part de trigrammes communs (Jaccard) pour une correspondance approchée
+
+
+def trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    """Libellés triés par forme normalisée : préfixe du libellé, puis préfixe d'un de ses mots, puis approché."""
+
+    def __init__(self, values):
+        values = sorted({value for value in values if isinstance(value, str)}, key=lambda value: (fold(value), value))
+        self.values = np.array(values, dtype=object)
+        self.keys = np.array([fold(value) for value in values], dtype=str)
+        # Mots suivant le premier : "paris" trouve aussi "Station F Paris"
+        words = sorted((word, row) for row, key in enumerate(self.keys) for word in key.split()[1:])
+        self.words = np.array([word for word, _ in words], dtype=str)
+        self.word_rows = np.array([row for _, row in words], dtype=np.int64)
+
+        # Trigrammes -> lignes, en tranches contiguës comme l'index des adresses
+        grams = sorted((gram, row) for row, key in enumerate(self.keys) for gram in trigrams(key))
+        self.grams, starts = np.unique(np.array([gram for gram, _ in grams], dtype=str), return_index=True)
+        self.gram_offsets = np.append(starts, len(grams)).astype(np.int64)
+        self.gram_rows = np.array([row for _, row in grams], dtype=np.int32)
+        self.gram_counts = np.bincount(self.gram_rows, minlength=len(self.values))
+
+    def __len__(self):
+        return len(self.values)
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        # Libellés correspondant à `query`, les meilleures correspondances d'abord
+        query = fold(query or "")
+        if not query:
+            return self.values[:limit].tolist()
+
+        start, stop = prefix_range(self.keys, query)
+        rows = list(range(start, min(stop, start + limit)))
+        if len(rows) < limit:
+            start, stop = prefix_range(self.words, query)
+            rows += [row for row in dict.fromkeys(self.word_rows[start:stop].tolist()) if row not in rows]
+        # Faute de frappe : libellés proches, seulement si rien d'autre n'a été trouvé
+        if not rows:
+            rows = self._similar(query, limit)
+        return self.values[rows[:limit]].tolist()
+
+    def _similar(self, query, limit):
+        # Libellés partageant le plus de trigrammes avec la requête (similarité de Jaccard)
+        query_grams = [gram for gram in trigrams(query)]
+        found = np.searchsorted(self.grams, query_grams)
+        found = found[(found < len(self.grams)) & (self.grams[np.minimum(found, len(self.grams) - 1)] == query_grams)]
+        if not len(found):
+            return []
+        shared = np.bincount(
+            np.concatenate([self.gram_rows[self.gram_offsets[i]:self.gram_offsets[i + 1]] for i in found]),
+            minlength=len(self.values),
+        )
+        similarity = shared / (len(query_grams) + self.gram_counts - shared)
+        best = np.flatnonzero(similarity >= MIN_SIMILARITY)
+        best = best[np.lexsort((best, -similarity[best]))][:limit]
+        return best.tolist()
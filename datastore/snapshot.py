@@ -0,0 +1,124 @@
+# Instantané binaire des tables normalisées : une colonne par fichier, relu en mémoire partagée (mmap)
+#
+# Format "npy" (par défaut, sans dépendance) : un répertoire par table contenant meta.json et
+#   - <i>.npy pour les colonnes numériques, booléennes et dates (relues en mmap),
+#   - <i>.codes.npy pour les catégorielles (modalités dans meta.json),
+#   - <i>.blob.npy + <i>.offsets.npy + <i>.missing.npy pour les chaînes (octets UTF-8 concaténés).
+# Formats "parquet" et "feather" : un fichier par table, si pyarrow est installé.
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+
+FORMATS = ("npy", "parquet", "feather")
+EXTENSIONS = {"parquet": ".parquet", "feather": ".feather"}
+
+
+def _stem(filename):
+    return os.path.splitext(filename)[0]
+
+
+def _write_npy(df, directory):
+    os.makedirs(directory)
+    columns = []
+    for i, (name, series) in enumerate(df.items()):
+        path = os.path.join(directory, str(i))
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            np.save(path + ".codes.npy", series.cat.codes.to_numpy())
+            columns.append({"name": name, "kind": "category", "categories": series.cat.categories.tolist(), "ordered": bool(series.cat.ordered)})
+        elif series.dtype == object:
+            values = series.to_numpy()
+            missing = series.isna().to_numpy()
+            if not all(isinstance(value, str) for value in values[~missing]):
+                raise TypeError(f"Colonne {name!r} : seules les chaînes sont prises en charge dans les colonnes object")
+            encoded = [b"" if null else value.encode("utf-8") for value, null in zip(values, missing)]
+            offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+            np.cumsum([len(value) for value in encoded], out=offsets[1:])
+            np.save(path + ".blob.npy", np.frombuffer(b"".join(encoded), dtype=np.uint8))
+            np.save(path + ".offsets.npy", offsets)
+            np.save(path + ".missing.npy", missing)
+            columns.append({"name": name, "kind": "string"})
+        else:
+            np.save(path + ".npy", series.to_numpy())
+            columns.append({"name": name, "kind": "array"})
+    with open(os.path.join(directory, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"rows": len(df), "columns": columns}, f, ensure_ascii=False)
+
+
+def _read_npy(directory, mmap_mode):
+    with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+        meta = json.load(f)
+    data = {}
+    for i, column in enumerate(meta["columns"]):
+        path = os.path.join(directory, str(i))
+        if column["kind"] == "category":
+            codes = np.asarray(np.load(path + ".codes.npy", mmap_mode=mmap_mode))
+            dtype = pd.CategoricalDtype(column["categories"], ordered=column["ordered"])
+            data[column["name"]] = pd.Categorical.from_codes(codes, dtype=dtype)
+        elif column["kind"] == "string":
+            blob = memoryview(np.load(path + ".blob.npy", mmap_mode=mmap_mode))  # Décodage sans copie intermédiaire
+            offsets = np.load(path + ".offsets.npy").tolist()
+            missing = np.load(path + ".missing.npy").tolist()
+            # Les chaînes Python sont reconstruites : seule cette étape n'est pas partagée entre workers.
+            # Comme le lecteur csv de pandas, une seule instance par valeur distincte
+            distinct = {}
+            values = np.empty(meta["rows"], dtype=object)
+            values[:] = [
+                np.nan if null else distinct.setdefault(text := str(blob[start:end], "utf-8"), text)
+                for start, end, null in zip(offsets[:-1], offsets[1:], missing)
+            ]
+            data[column["name"]] = values
+        else:
+            data[column["name"]] = np.asarray(np.load(path + ".npy", mmap_mode=mmap_mode))  # ndarray sur le fichier projeté
+    # copy=False : les colonnes numériques restent des vues sur les fichiers projetés en mémoire
+    return pd.DataFrame(data, copy=False)
+
+
+def write(tables, root, version, fmt="npy"):
+    # Écrit l'instantané de `version` (répertoire temporaire puis renommage) et supprime les anciens
+    if fmt not in FORMATS:
+        raise ValueError(f"Format inconnu : {fmt} (attendu : {', '.join(FORMATS)})")
+    os.makedirs(root, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=root)
+    for filename, df in tables.items():
+        if fmt == "npy":
+            _write_npy(df, os.path.join(tmp, _stem(filename)))
+        elif fmt == "parquet":
+            df.to_parquet(os.path.join(tmp, _stem(filename) + EXTENSIONS[fmt]))
+        else:
+            df.to_feather(os.path.join(tmp, _stem(filename) + EXTENSIONS[fmt]))
+    with open(os.path.join(tmp, "FORMAT"), "w", encoding="utf-8") as f:
+        f.write(fmt)
+
+    directory = os.path.join(root, version)
+    if os.path.exists(directory):
+        shutil.rmtree(directory)
+    os.replace(tmp, directory)
+
+    # Un instantané d'une autre version est périmé ; encore projeté en mémoire par un worker,
+    # sa suppression peut échouer sous Windows et sera retentée à la prochaine écriture
+    for entry in os.listdir(root):
+        if entry != version:
+            shutil.rmtree(os.path.join(root, entry), ignore_errors=True)
+    return directory
+
+
+def read(filenames, root, version, mmap_mode="r"):
+    # Tables de l'instantané de `version`, ou None s'il n'existe pas (absent ou périmé)
+    directory = os.path.join(root, version)
+    if not os.path.exists(os.path.join(directory, "FORMAT")):
+        return None
+    with open(os.path.join(directory, "FORMAT"), encoding="utf-8") as f:
+        fmt = f.read().strip()
+
+    tables = {}
+    for filename in filenames:
+        if fmt == "npy":
+            tables[filename] = _read_npy(os.path.join(directory, _stem(filename)), mmap_mode)
+        elif fmt == "parquet":
+            tables[filename] = pd.read_parquet(os.path.join(directory, _stem(filename) + EXTENSIONS[fmt]))
+        else:
+            tables[filename] = pd.read_feather(os.path.join(directory, _stem(filename) + EXTENSIONS[fmt]))
+    return tables
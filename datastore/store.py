@@ -0,0 +1,181 @@
+import hashlib
+import json
+import os
+import threading
+import pandas as pd
+from datastore.cube import Cube
+from datastore.geo import GridClusterIndex, NearbyIndex
+from datastore.index import InvertedIndex
+from datastore.keys import CompanyIndex, GroupIndex
+from datastore.keywords import KeywordCounts
+from datastore.location import LocationIndex
+from datastore.normalize import NORMALIZE_VERSION, normalize
+from datastore.search import SearchIndex
+from datastore import snapshot
+
+# Copy-on-write : les vues renvoyées partagent la mémoire des tables du store,
+# toute modification chez l'appelant déclenche une copie locale au lieu d'altérer le store
+pd.set_option("mode.copy_on_write", True)
+
+ASSETS_DIR = "assets"
+ARTIFACTS_DIR = os.environ.get("STARTHUB_ARTIFACTS_DIR", "artifacts")  # Index et tables précalculés
+SNAPSHOT_DIR = os.path.join(ARTIFACTS_DIR, "snapshot")  # Instantané binaire des tables (build_snapshot.py)
+FILES = ["societes.csv", "financements.csv", "personnes.csv"]  # Liste des fichiers à charger
+
+# Typage des colonnes appliqué une seule fois au chargement
+DTYPES = {
+    "societes.csv": {
+        "category": ["Effectif_def"],
+        "datetime": ["date_creation_def"],
+    },
+    "financements.csv": {
+        "category": ["Série"],
+        "datetime": ["Date dernier financement"],
+        "float": ["Montant_def"],
+    },
+    "personnes.csv": {},
+}
+
+# Colonnes multi-valeurs de societes.csv indexées au chargement, avec leur séparateur
+# (les mots-clés, comptés par KeywordCounts pour le nuage de mots, ne le sont pas)
+INDEXED_COLUMNS = {
+    "Sous-Catégorie": "|",
+}
+
+# Tables référençant societes.csv par entreprise_id, regroupées par entreprise au chargement
+GROUPED_FILES = ["financements.csv", "personnes.csv"]
+
+
+def _apply_dtypes(df, spec):
+    for col in spec.get("category", []):
+        df[col] = df[col].astype("category")
+    for col in spec.get("datetime", []):
+        df[col] = pd.to_datetime(df[col], errors="coerce")
+    for col in spec.get("float", []):
+        df[col] = pd.to_numeric(df[col], errors="coerce").astype("float64")
+    return df
+
+
+def source_version(assets_dir=ASSETS_DIR):
+    # Version du jeu de données : empreinte des dates de modification et tailles des csv, du typage
+    # et des colonnes dérivées (un instantané écrit avec un autre schéma n'est pas relu)
+    h = hashlib.sha1(f"{json.dumps(DTYPES, sort_keys=True)}:{NORMALIZE_VERSION};".encode())
+    for file in FILES:
+        stat = os.stat(os.path.join(assets_dir, file))
+        h.update(f"{file}:{stat.st_mtime_ns}:{stat.st_size};".encode())
+    return h.hexdigest()[:12]
+
+
+def read_sources(assets_dir=ASSETS_DIR):
+    # Lecture des csv, typage et colonnes dérivées
+    tables = {}
+    for file in FILES:
+        df = pd.read_csv(f"{assets_dir}/{file}")
+        df = _apply_dtypes(df, DTYPES.get(file, {}))
+        tables[file] = normalize(file, df)
+    return tables
+
+
+class DataStore:
+    """Tables typées chargées une fois par processus et partagées en lecture seule."""
+
+    def __init__(self, assets_dir=ASSETS_DIR, snapshot_dir=SNAPSHOT_DIR):
+        self.assets_dir = assets_dir
+        self.version = source_version(assets_dir)
+        # Instantané de la version courante des csv s'il existe, sinon lecture des csv
+        self._tables = snapshot.read(FILES, snapshot_dir, self.version) if snapshot_dir else None
+        self.source = "snapshot" if self._tables is not None else "csv"
+        if self._tables is None:
+            self._tables = read_sources(assets_dir)
+
+        societes = self._tables["societes.csv"]
+        self._indexes = {col: InvertedIndex(societes[col], sep) for col, sep in INDEXED_COLUMNS.items()}
+        self._companies = CompanyIndex(societes["entreprise_id"], societes["nom"])
+        self._groups = {
+            file: GroupIndex(self._companies.rows(self._tables[file]["entreprise_id"]), len(societes))
+            for file in GROUPED_FILES
+        }
+        self._grid = GridClusterIndex(societes["latitude"], societes["longitude"])
+        self._location = LocationIndex(societes["adresse_def"])
+        self._nearby = None
+        self._cube = None
+        self._search = {}
+        self._keywords = KeywordCounts(societes["mots_cles_def"])
+
+    def table(self, filename):
+        # Copie superficielle : aucune donnée dupliquée, protégée par le copy-on-write
+        return self._tables[filename].copy(deep=False)
+
+    def index(self, column):
+        # Index inversé sur une colonne multi-valeurs (positions des lignes de societes.csv)
+        return self._indexes[column]
+
+    def company_index(self):
+        # Positions des lignes de societes.csv par entreprise_id et par nom
+        return self._companies
+
+    def rows_of(self, filename, company_row):
+        # Lignes de financements.csv ou personnes.csv de l'entreprise, sans jointure
+        return self._tables[filename].iloc[self._groups[filename].rows(company_row)]
+
+    def grid(self):
+        # Index spatial pour le regroupement des points de la carte
+        return self._grid
+
+    def cube(self):
+        # Agrégats du dashboard, construits au premier usage
+        if self._cube is None:
+            self._cube = Cube(self._tables["societes.csv"], self._tables["financements.csv"], self._indexes["Sous-Catégorie"])
+        return self._cube
+
+    def search_index(self, column):
+        # Recherche des libellés d'une colonne de societes.csv (valeurs de l'index inversé pour
+        # les colonnes multi-valeurs), construite au premier usage
+        if column not in self._search:
+            values = self._indexes[column].tokens if column in self._indexes else self._tables["societes.csv"][column]
+            self._search[column] = SearchIndex(values)
+        return self._search[column]
+
+    def keywords(self):
+        # Occurrences des mots-clés par entreprise, pour le nuage de mots
+        return self._keywords
+
+    def nearby(self):
+        # Index des requêtes de proximité, construit au premier usage (import de scikit-learn)
+        if self._nearby is None:
+            societes = self._tables["societes.csv"]
+            self._nearby = NearbyIndex(societes["latitude"], societes["longitude"])
+        return self._nearby
+
+    def location(self):
+        # Index des adresses pour la recherche par ville / code postal
+        return self._location
+
+    def tables(self):
+        return {file: self.table(file) for file in self._tables}
+
+
+_store = None
+_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    # Version publiée : les changements de csv sont pris en compte par reload_store (datastore.reloader)
+    if _store is None:
+        with _lock:
+            if _store is None:
+                _store = DataStore()
+    return _store
+
+
+def reload_store():
+    # Nouvelle version construite à côté de l'actuelle, qui continue de servir les requêtes,
+    # avec ses agrégats dérivés, puis publiée d'un seul coup
+    global _store
+    store = DataStore()
+    store.cube()
+    store.nearby()
+    with _lock:
+        _store = store
+    return store
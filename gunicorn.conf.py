@@ -0,0 +1,43 @@
+# Configuration gunicorn : gunicorn -c gunicorn.conf.py app:server
+# L'application, les tables, les index et les pages sont chargés une seule fois dans le processus
+# maître puis partagés par les workers après le fork (copie sur écriture). Avec un instantané
+# (build_snapshot.py), les colonnes numériques sont en plus projetées depuis le même fichier.
+# Les csv sont surveillés par le maître seul : il recharge une fois puis renouvelle les workers.
+import gc
+import multiprocessing
+import os
+import signal
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8080)}"
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+preload_app = True  # Import de app.py dans le maître, avant le fork
+timeout = 120
+
+
+def _freeze():
+    # Objets existants exclus du ramasse-miettes : ses parcours ne réécrivent plus
+    # les pages mémoire partagées, qui restent communes aux workers
+    gc.unfreeze()
+    gc.collect()
+    gc.freeze()
+
+
+def when_ready(server):
+    from datastore.reloader import start_watcher
+    from warmup import prepare_shared, refresh_caches
+
+    prepare_shared()
+    _freeze()
+    server.log.info("Données partagées prêtes avant le fork des workers")
+
+    def on_reload(store):
+        # Nouvelle version préparée une seule fois, dans le maître (table des recommandations,
+        # pages, caches), puis workers renouvelés : avec preload_app, SIGHUP forke de nouveaux
+        # workers depuis la mémoire du maître et arrête les anciens après leurs requêtes en cours
+        refresh_caches(store)
+        _freeze()
+        server.log.info("Données rechargées (version %s) : renouvellement des workers", store.version)
+        os.kill(os.getpid(), signal.SIGHUP)
+
+    # Thread du maître uniquement : il n'est pas copié dans les workers forkés
+    start_watcher(on_reload)
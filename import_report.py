@@ -0,0 +1,68 @@
+# Rapport du coût d'import des modules de l'application et de la préparation différée des pages
+#   python import_report.py [--top N]
+import argparse
+import subprocess
+import sys
+import time
+
+# Modules suivis individuellement dans le rapport
+TRACKED_PREFIXES = ("app", "pages", "datastore", "warmup")
+
+
+def parse_importtime(stderr):
+    # Lignes "import time: self [us] | cumulative | module" produites par python -X importtime
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us) / 1e6, int(cumulative_us) / 1e6))
+    return rows
+
+
+def import_costs(module="app"):
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr[-2000:])
+    return parse_importtime(proc.stderr), time.perf_counter() - start
+
+
+def page_costs():
+    # Temps de la préparation différée de chaque page (données, modèles, imports lourds)
+    from app import PAGES, home, page_layout
+
+    costs = {}
+    for route, page in {"/": home, **PAGES}.items():
+        start = time.perf_counter()
+        page_layout(page)
+        costs[route] = time.perf_counter() - start
+    return costs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Coût d'import des modules et de la première visite des pages")
+    parser.add_argument("--top", type=int, default=15, help="Nombre de paquets tiers les plus coûteux à afficher")
+    args = parser.parse_args()
+
+    rows, wall = import_costs()
+    print(f"import app : {wall:.2f}s (processus complet)\n")
+
+    print("Modules de l'application (cumulé)")
+    for name, _, cumulative in rows:
+        if name.split(".")[0] in TRACKED_PREFIXES:
+            print(f"  {name:40s} {cumulative:8.3f}s")
+
+    # Paquets tiers : coût cumulé de leur import de premier niveau
+    packages = {}
+    for name, _, cumulative in rows:
+        top_level = name.split(".")[0]
+        if top_level not in TRACKED_PREFIXES and name == top_level:
+            packages[top_level] = max(packages.get(top_level, 0), cumulative)
+    print(f"\nPaquets tiers les plus coûteux (top {args.top})")
+    for name, cumulative in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {name:40s} {cumulative:8.3f}s")
+
+    print("\nPremière visite des pages (préparation différée)")
+    for route, duration in page_costs().items():
+        print(f"  {route:40s} {duration:8.3f}s")
@@ -0,0 +1,226 @@
+# Instrumentation des callbacks Dash : durée totale, chargement des données, calcul et
+# sérialisation de la réponse, taille de la réponse. Exposée au format texte Prometheus
+# par la route /metrics ; chaque worker gunicorn publie ses propres mesures.
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+import dash
+import dash._callback
+from dash.exceptions import PreventUpdate
+from flask import request
+
+WINDOW = 1000  # Dernières exécutions retenues pour le calcul des quantiles
+QUANTILES = (0.5, 0.95, 0.99)
+PHASES = ("total", "load", "compute", "serialize")
+
+# La phase "serialize" enveloppe la sérialisation interne des callbacks de Dash 2 : avec une autre
+# version, ou si cette fonction disparaît, elle n'est pas mesurée et reste comptée dans "compute"
+SERIALIZER_PATCHABLE = dash.__version__.split(".")[0] == "2" and callable(getattr(dash._callback, "to_json", None))
+
+
+class Summary:
+    """Quantiles sur une fenêtre glissante, somme et nombre d'observations cumulés."""
+
+    def __init__(self):
+        self.window = deque(maxlen=WINDOW)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self.window.append(value)
+            self.sum += value
+            self.count += 1
+
+    def quantiles(self):
+        with self._lock:
+            values = sorted(self.window)
+        return {q: values[min(int(q * len(values)), len(values) - 1)] for q in QUANTILES} if values else {}
+
+
+class CallbackMetrics:
+    """Mesures d'un callback : une durée par phase, taille des réponses, mises à jour évitées."""
+
+    def __init__(self):
+        self.seconds = {phase: Summary() for phase in PHASES}
+        self.response_bytes = Summary()
+        self.prevented = 0
+
+
+_metrics = {}  # nom du callback -> CallbackMetrics
+_summaries = {}  # métrique -> (description, {étiquettes: Summary}), publiées en plus des callbacks
+_metrics_lock = threading.Lock()
+_state = threading.local()  # Chronométrage du callback en cours d'exécution dans ce thread
+
+
+class _Timer:
+    def __init__(self):
+        self.phases = {"load": 0.0, "serialize": 0.0}
+        self.active = False
+
+
+@contextmanager
+def phase(name):
+    # Temps passé dans le bloc attribué à une phase du callback en cours.
+    # Hors callback, ou dans une phase déjà ouverte, le bloc n'est pas compté une seconde fois
+    timer = getattr(_state, "timer", None)
+    if timer is None or timer.active:
+        yield
+        return
+    timer.active = True
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer.phases[name] += time.perf_counter() - start
+        timer.active = False
+
+
+def timed(name):
+    # Décorateur : toute exécution de la fonction compte dans la phase `name`
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with phase(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def summary(metric, description, **labels):
+    # Série supplémentaire publiée sur /metrics, ex : temps de construction d'une sortie du dashboard
+    with _metrics_lock:
+        _, series = _summaries.setdefault(metric, (description, {}))
+        return series.setdefault(tuple(sorted(labels.items())), Summary())
+
+
+def _metrics_for(name):
+    with _metrics_lock:
+        return _metrics.setdefault(name, CallbackMetrics())
+
+
+def _record(name, total, timer, prevented):
+    metrics = _metrics_for(name)
+    load, serialize = timer.phases["load"], timer.phases["serialize"]
+    for key, value in (("total", total), ("load", load), ("serialize", serialize),
+                       ("compute", max(total - load - serialize, 0.0))):
+        metrics.seconds[key].observe(value)
+    if prevented:
+        metrics.prevented += 1
+
+
+def callback_name(func):
+    # Nom d'un callback dans les mesures : module (sans le paquet) et fonction
+    return f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+
+
+def _instrument_callback(name, func):
+    # `func` est la fonction enregistrée par Dash : elle valide les sorties et renvoie la réponse JSON
+    @wraps(func)
+    def timed_callback(*args, **kwargs):
+        timer = _state.timer = _Timer()
+        start = time.perf_counter()
+        prevented = False
+        try:
+            return func(*args, **kwargs)
+        except PreventUpdate:
+            prevented = True
+            raise
+        finally:
+            _state.timer = None
+            _record(name, time.perf_counter() - start, timer, prevented)
+
+    timed_callback.instrumented = True
+    return timed_callback
+
+
+def _timed_to_json(to_json):
+    @wraps(to_json)
+    def wrapper(obj):
+        with phase("serialize"):
+            return to_json(obj)
+    wrapper.instrumented = True
+    return wrapper
+
+
+def instrument(app):
+    # Sérialisation des réponses des callbacks chronométrée
+    if SERIALIZER_PATCHABLE and not getattr(dash._callback.to_json, "instrumented", False):
+        dash._callback.to_json = _timed_to_json(dash._callback.to_json)
+
+    names = {}  # Sortie d'un callback (champ "output" des requêtes) -> nom dans les mesures
+    lock = threading.Lock()
+    server = app.server
+
+    # Les callbacks des pages (dash.callback) ne rejoignent app.callback_map qu'à la première
+    # requête : ils sont enveloppés une seule fois à ce moment-là, puis le hook est retiré
+    def wrap_callbacks():
+        with lock:
+            hooks = server.before_request_funcs.get(None, [])
+            if wrap_callbacks not in hooks:
+                return
+            for output, entry in app.callback_map.items():
+                func = entry.get("callback")
+                if func is not None and not getattr(func, "instrumented", False):
+                    names[output] = callback_name(func)
+                    entry["callback"] = _instrument_callback(names[output], func)
+            # Nouvelle liste : les requêtes en cours parcourent encore l'ancienne
+            server.before_request_funcs[None] = [hook for hook in hooks if hook is not wrap_callbacks]
+
+    # Taille des réponses lue sur la réponse HTTP de chaque callback
+    update_path = app.config.routes_pathname_prefix + "_dash-update-component"
+
+    def record_response_size(response):
+        if request.path == update_path and response.status_code == 200:
+            name = names.get((request.get_json(silent=True) or {}).get("output"))
+            if name is not None:
+                _metrics_for(name).response_bytes.observe(response.calculate_content_length() or 0)
+        return response
+
+    server.before_request(wrap_callbacks)
+    server.after_request(record_response_size)
+
+
+def _labels(labels):
+    return ",".join(f'{key}="{value}"' for key, value in labels.items())
+
+
+def _summary_lines(metric, labels, summary):
+    lines = [f"{metric}{{{_labels(dict(labels, quantile=q))}}} {value:.6g}" for q, value in summary.quantiles().items()]
+    lines.append(f"{metric}_sum{{{_labels(labels)}}} {summary.sum:.6g}")
+    lines.append(f"{metric}_count{{{_labels(labels)}}} {summary.count}")
+    return lines
+
+
+def render():
+    # Mesures de ce worker au format d'exposition texte Prometheus
+    with _metrics_lock:
+        metrics = sorted(_metrics.items())
+        summaries = [(metric, description, sorted(series.items())) for metric, (description, series) in sorted(_summaries.items())]
+    lines = [
+        "# HELP starthub_callback_seconds Durée des callbacks Dash par phase (quantiles sur les dernières exécutions)",
+        "# TYPE starthub_callback_seconds summary",
+    ]
+    for name, m in metrics:
+        for key in PHASES:
+            lines += _summary_lines("starthub_callback_seconds", {"callback": name, "phase": key}, m.seconds[key])
+    lines += [
+        "# HELP starthub_callback_response_bytes Taille des réponses JSON des callbacks",
+        "# TYPE starthub_callback_response_bytes summary",
+    ]
+    for name, m in metrics:
+        lines += _summary_lines("starthub_callback_response_bytes", {"callback": name}, m.response_bytes)
+    lines += [
+        "# HELP starthub_callback_prevented_total Appels terminés sans mise à jour (PreventUpdate)",
+        "# TYPE starthub_callback_prevented_total counter",
+    ]
+    lines += [f'starthub_callback_prevented_total{{callback="{name}"}} {m.prevented}' for name, m in metrics]
+    for metric, description, series in summaries:
+        lines += [f"# HELP {metric} {description}", f"# TYPE {metric} summary"]
+        for labels, values in series:
+            lines += _summary_lines(metric, dict(labels), values)
+    return "\n".join(lines) + "\n"
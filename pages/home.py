@@ -1,77 +1,94 @@
 from dash import Dash, html, dcc, Output, Input, State, ALL, callback, callback_context
 import dash_bootstrap_components as dbc
 import pandas as pd
-from app import get_dataframe
-from sklearn.neighbors import NearestNeighbors
-from sklearn.pipeline import Pipeline
+from functools import lru_cache
+from app import search_options
+import metrics
+from datastore import get_store, recommender
 
-# Chargement des données
-df = get_dataframe('societes.csv')
-df_fin = get_dataframe('financements.csv')
+# Chargement des données, différé à la première visite de la page
+@lru_cache(maxsize=1)
+def _load(store):
+    # Chargement des données : une ligne par entreprise, financements et contacts lus par entreprise
+    # dans les index de regroupement du store (store.rows_of)
+    return store.table('societes.csv')
 
-# Fusion des datasets via entreprise_id
-df = df.merge(df_fin, on='entreprise_id', how='left')
+@metrics.timed("load")
+def load(store=None):
+    # Données et voisins de la version de `store` (par défaut la version publiée).
+    # Table des 13 plus proches voisins (Manhattan) précalculée par build_recommendations.py :
+    # None tant qu'elle n'est pas publiée, la page s'affiche alors sans recommandations
+    store = store or get_store()
+    df = _load(store)
+    return df, recommender.published(df, store.version, k=13)
 
-# Préparation des données pour KNN
-keywords_dummies = df['mots_cles_def'].str.get_dummies(sep=', ')
-market_dummies = df['market'].str.get_dummies(sep=', ')
-activite_dummies = df['Activité principale'].str.get_dummies(sep=', ')
+# Champs d'une levée ; une ligne de financements.csv sans aucun d'eux n'est qu'un emplacement vide
+FINANCEMENT_FIELDS = ['Date dernier financement', 'Série', 'Montant_def', 'valeur_entreprise']
 
-X_extended = pd.concat([keywords_dummies, market_dummies, activite_dummies], axis=1)
-X_extended.reset_index(drop=True, inplace=True)
-
-# Entraînement du modèle KNN
-pipeline = Pipeline([
-    ('knn', NearestNeighbors(n_neighbors=13, metric='manhattan'))
-])
-pipeline.fit(X_extended)
+# Valeur affichée d'un champ, "Non disponible" si absente
+def display_value(value):
+    if pd.isna(value) or value == "":
+        return "Non disponible"
+    if isinstance(value, pd.Timestamp):
+        return value.strftime('%Y-%m-%d')
+    return value
 
 # Fonction de recommandation
-def recommend_societes(selected_startup, data, X_extended, pipeline):
-    if selected_startup not in data['nom'].values:
+def recommend_societes(selected_id, data, neighbours, store):
+    if neighbours is None or store.company_index().row(selected_id) is None:
         return pd.DataFrame()
+
+    # Lignes des voisins lues en une passe dans l'index des clés, sans jointure sur toute la table
+    ids, distances = neighbours.neighbours(selected_id)
+    rows = store.company_index().rows(ids)
+    keep = (rows >= 0) & (ids != selected_id)
+    voisins = data.iloc[rows[keep]].assign(Distance=distances[keep])
+    voisins = voisins.sort_values(by='Distance', kind='stable').head(10)
     
-    entreprise_index = data.index[data['nom'] == selected_startup].tolist()[0]
-    entreprise_data = X_extended.loc[entreprise_index].to_frame().T
-    
-    distances, indices = pipeline.named_steps['knn'].kneighbors(entreprise_data)
-    voisins = data.iloc[indices[0]].copy()
-    voisins['Distance'] = distances[0]
-    voisins = voisins[voisins['nom'] != selected_startup]
-    voisins = voisins.sort_values(by='Distance').head(10)
-    
-    return voisins[['nom', 'description', 'logo', 'mots_cles_def', 'market', 'Activité principale']]
+    return voisins[['entreprise_id', 'nom', 'description', 'logo', 'mots_cles_def', 'market', 'Activité principale']]
 
-# Stockage de la startup sélectionnée
-layout = dbc.Container([
-    html.Div([
+# Layout construit à la première visite (il dépend des données)
+def layout():
+    df, _ = load()
+    first = df.iloc[0]
+    return dbc.Container([
+        html.Div([
+            dbc.Container([
+                dbc.Row([
+                    dbc.Col([
+                        html.H1("Base de données entreprises innovantes", className="hero-title mb-4"),
+                        html.H5("Recherchez une société", className="hero-subtitle mb-4")
+                    ], md=8, lg=6)
+                ], className="min-vh-75 align-items-center")
+            ], fluid=True)
+        ], className="hero-section mb-5"),
+
+        # Contenu principal après le header
         dbc.Container([
-            dbc.Row([
-                dbc.Col([
-                    html.H1("Base de données entreprises innovantes", className="hero-title mb-4"),
-                    html.H5("Recherchez une société", className="hero-subtitle mb-4")
-                ], md=8, lg=6)
-            ], className="min-vh-75 align-items-center")
+            dcc.Store(id="selected-startup", data=int(first["entreprise_id"])),  # entreprise_id affiché
+            dcc.Dropdown(
+                id='df-dropdown',
+                options=search_options("nom", selected=first["nom"]),  # Complétées à la saisie par search_startups
+                value=first["nom"],
+                placeholder='Sélectionnez ou entrez une start-up',
+                searchable=True,
+                className="mb-4"
+            ),
+            html.Div(id="startup-info", className="text-center text-light"),
+            html.Br(),
+            html.H2("Ces sociétés peuvent vous intéresser :", className="section-title text-center mb-5"),
+            html.Div(id="recommended-startups", className="mt-5"),
         ], fluid=True)
-    ], className="hero-section mb-5"),
-
-    # Contenu principal après le header
-    dbc.Container([
-        dcc.Store(id="selected-startup", data=df["nom"].iloc[0]),
-        dcc.Dropdown(
-            id='df-dropdown',
-            options=[{'label': name, 'value': name} for name in df.nom.unique()],
-            value=df["nom"].iloc[0],
-            placeholder='Sélectionnez ou entrez une start-up',
-            searchable=True,
-            className="mb-4"
-        ),
-        html.Div(id="startup-info", className="text-center text-light"),
-        html.Br(),
-        html.H2("Ces sociétés peuvent vous intéresser :", className="section-title text-center mb-5"),
-        html.Div(id="recommended-startups", className="mt-5"),
     ], fluid=True)
-], fluid=True)
+
+# Noms recherchés côté serveur : la page n'embarque plus la liste de toutes les entreprises
+@callback(
+    Output("df-dropdown", "options"),
+    Input("df-dropdown", "search_value"),
+    State("df-dropdown", "value")
+)
+def search_startups(search_value, selected):
+    return search_options("nom", search_value, selected)
 
 @callback(
     Output("selected-startup", "data"),
@@ -79,44 +96,68 @@ layout = dbc.Container([
     [State({"type": "recommended-startup", "index": ALL}, "id")]
 )
 def update_selected_startup(selected_startup, n_clicks, button_ids):
+    # Le nom choisi désigne la première entreprise qui le porte ; les cartes recommandées
+    # portent l'entreprise_id et distinguent donc les homonymes
+    selected_id = get_store().company_index().id_by_name(selected_startup)
     ctx = callback_context
     if not ctx.triggered:
-        return selected_startup
+        return selected_id
     trigger_id = ctx.triggered[0]['prop_id']
     if "df-dropdown" in trigger_id:
-        return selected_startup
+        return selected_id
     elif "recommended-startup" in trigger_id:
         for i, n in enumerate(n_clicks):
             if n and button_ids[i]:
                 return button_ids[i]["index"]
-    return selected_startup
+    return selected_id
 
 @callback(
     [Output("startup-info", "children"),
      Output("recommended-startups", "children")],
     [Input("selected-startup", "data")]
 )
-def update_startup_info(selected_startup):
-    if not selected_startup:
+def update_startup_info(selected_id):
+    store = get_store()  # Une seule version des données pour toute la fiche
+    row = store.company_index().row(selected_id)
+    if row is None:
         return "", ""
 
-    startup_data = df[df["nom"] == selected_startup].iloc[0]
+    df, neighbours = load(store)
+
+    startup_data = df.iloc[row]
+    # Historique complet des levées (plus récente en premier) et contacts de l'entreprise
+    rounds = store.rows_of('financements.csv', row).dropna(subset=FINANCEMENT_FIELDS, how='all')
+    rounds = rounds.sort_values('Date dernier financement', ascending=False, kind='stable')
+    contacts = store.rows_of('personnes.csv', row)
     
     categories_buttons = [
         html.Button(
             category,
             className="btn btn-outline-primary btn-sm mx-1 disabled"
-        ) for category in startup_data.get("Sous-Catégorie", "").split("|") if category
+        ) for category in str(startup_data["Sous-Catégorie"]).split("|") if category and pd.notna(startup_data["Sous-Catégorie"])
     ]
     
     financement_card = dbc.Card([
-        dbc.CardHeader("Financement"),
+        dbc.CardHeader(f"Financement ({len(rounds)} levée{'s' if len(rounds) > 1 else ''})" if len(rounds) else "Financement"),
+        dbc.CardBody([
+            html.Div([
+                html.P([html.Strong("Date financement: "), display_value(levee["Date dernier financement"])]),
+                html.P([html.Strong("Montant financement: "), display_value(levee["Montant_def"])]),
+                html.P([html.Strong("Série: "), display_value(levee["Série"])]),
+                html.P([html.Strong("Valeur entreprise: "), display_value(levee["valeur_entreprise"])]),
+                html.Hr() if i < len(rounds) - 1 else None,
+            ]) for i, (_, levee) in enumerate(rounds.iterrows())
+        ] or html.P("Non disponible")),
+    ])
+
+    contacts_card = dbc.Card([
+        dbc.CardHeader("Contacts"),
         dbc.CardBody([
-            html.P([html.Strong("Date dernier financement: "), startup_data.get("Date dernier financement", "Non disponible")]),
-            html.P([html.Strong("Montant financement: "), startup_data.get("Montant_def", "Non disponible")]),
-            html.P([html.Strong("Série: "), startup_data.get("Série", "Non disponible")]),
-            html.P([html.Strong("Valeur entreprise: "), startup_data.get("valeur_entreprise", "Non disponible")]),
-        ]),
+            html.P([
+                html.Strong(f"{contact['Prenom']} {contact['Nom']}"),
+                f" — {contact['Poste']}" if pd.notna(contact['Poste']) else "",
+            ]) for _, contact in contacts.fillna({'Nom': '', 'Prenom': ''}).iterrows()
+        ] or html.P("Non disponible")),
     ])
     
     description_card = dbc.Card([
@@ -143,14 +184,15 @@ def update_startup_info(selected_startup):
             ])
         ]), width=3),
         dbc.Col(financement_card, width=3),
-        dbc.Col(description_card, width=3)
+        dbc.Col(description_card, width=3),
+        dbc.Col(contacts_card, width=12, className="mt-4")
     ])
     
-    recommended = recommend_societes(selected_startup, df, X_extended, pipeline)
+    recommended = recommend_societes(selected_id, df, neighbours, store)
     recommended_card = dbc.Row([
         dbc.Col(dbc.Card([
             dbc.CardBody([
-                html.H5(row["nom"], className="text-center", id={"type": "recommended-startup", "index": row["nom"]}),
+                html.H5(row["nom"], className="text-center", id={"type": "recommended-startup", "index": int(row["entreprise_id"])}),
                 html.Img(
                     src=row["logo"] if pd.notna(row["logo"]) else "/assets/default_logo.png",
                     style={"width": "300px", "height": "300px", "object-fit": "contain", "margin": "0 auto", "display": "block"}
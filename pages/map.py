@@ -1,21 +1,41 @@
-from dash import Dash, html, dcc, Output, Input, State
+from dash import Dash, html, dcc, Output, Input, State, no_update
 import dash_bootstrap_components as dbc
 import pandas as pd
-from dash import callback
-from app import get_dataframe  # Importer app et la fonction get_dataframe
-import plotly.graph_objects as go
-import plotly.express as px
-import ast  # convertir chaîne représentant une liste en vraie liste
+from dash import callback, callback_context
+from dash.exceptions import PreventUpdate
+from app import search_options  # Importer app et ses fonctions d'accès aux données
+import metrics
+from datastore import get_store, geo
+from functools import lru_cache
+import numpy as np
 
 
-# Chargement des données
-df = get_dataframe('societes.csv')
-df['Sous-Catégorie'] = df['Sous-Catégorie'].apply(lambda x: x.split("|") if isinstance(x, str) else [])
-unique_categories = sorted(set(cat for sublist in df['Sous-Catégorie'].dropna() for cat in sublist))
+# Chargement des données, différé à la première visite de la page
+@lru_cache(maxsize=1)
+def _load(store):
+    df = store.table('societes.csv')
 
-# Moyenne des longitude et lat
-center_lat = df['latitude'].mean()
-center_lon = df['longitude'].mean()
+    # Fiches affichées au survol, indexées par entreprise_id : la figure ne transporte que l'identifiant
+    fiches = pd.DataFrame({
+        "logo": df['logo'],
+        "adresse": df['adresse_def'],
+        "date_creation": df['date_creation_def'].dt.strftime('%Y-%m-%d'),
+        "categories": df['Sous-Catégorie'].str.split("|"),
+        "description": df['description'],
+    }).astype(object)
+    fiches = fiches.where(fiches.notna(), None)
+    details = dict(zip(df['entreprise_id'].tolist(), fiches.itertuples(index=False, name=None)))
+
+    # Moyenne des longitude et lat
+    center_lat = df['latitude'].mean()
+    center_lon = df['longitude'].mean()
+    return df, details, center_lat, center_lon
+
+@metrics.timed("load")
+def load(store=None):
+    # Données de la page pour `store` : le même store sert à tout le callback, même si un
+    # rechargement publie une nouvelle version pendant son exécution
+    return _load(store or get_store())
 
 @callback(
     [Output("image-container", "children"),
@@ -29,19 +49,20 @@ def display_hover_image(hoverData):
         return "", "", "", ""
 
     point = hoverData["points"][0]
-    custom_data = point.get("customdata", [])
+    if "customdata" not in point:  # Survol d'un groupe : pas de fiche à afficher
+        return "", "", "", ""
 
-    while len(custom_data) < 5:
-        custom_data.append("")
+    _, details, _, _ = load()
+    fiche = details.get(point["customdata"])
+    if fiche is None:
+        return "", "", "", ""
 
     name = point["hovertext"]
-    image_url = custom_data[0] if custom_data[0] else None
-    adresse = custom_data[1] if custom_data[1] else "Adresse non disponible"
-    date_creation = custom_data[2] if custom_data[2] else "Non disponible"
-    categories = custom_data[3] if custom_data[3] else "Non spécifiée"
-    description = custom_data[4] if custom_data[4] else "Description non disponible"
-
-    categories_list = ast.literal_eval(categories) if isinstance(categories, str) else []
+    image_url, adresse, date_creation, categories_list, description = fiche
+    adresse = adresse or "Adresse non disponible"
+    date_creation = date_creation or "Non disponible"
+    categories_list = categories_list or []
+    description = description or "Description non disponible"
 
     # Création des boutons pour les catégories
     categories_buttons = [html.Button(category.strip(), className="btn btn-outline-primary btn-sm m-1 disabled")for category in categories_list if category.strip()]  # Vérifie que la catégorie n'est pas vide
@@ -63,42 +84,50 @@ def display_hover_image(hoverData):
     )
 
 # Fonction pour créer la carte
-def create_map(filtered_df=None):
-    if filtered_df is None:
-        filtered_df = df
-
-    if 'latitude' in filtered_df.columns and 'longitude' in filtered_df.columns:
-        fig = px.scatter_mapbox(
-            filtered_df,
-            lat="latitude",
-            lon="longitude",
-            hover_name="nom",
-            hover_data={
-                "logo": False,
-                "adresse_def": True,
-                "date_creation_def": False,
-                "Sous-Catégorie": False,
-                "description": False,
-                "latitude": False,
-                "longitude": False
-            },
-            zoom=5,
-            center={"lat": center_lat, "lon": center_lon},
-        )
-
-    #fig.update_traces(marker=dict(size=8), opacity=0.7), # Affichage sans clusters
-                    
-    fig.update_traces(marker=dict(size=14), cluster=dict(enabled=True, color="blue", opacity=0.7), # Affichage avec clusters
-                    customdata=filtered_df[["logo", "adresse_def", "date_creation_def", "Sous-Catégorie", "description"]].astype(str).values)
+# Le regroupement est calculé côté serveur pour la vue courante : seuls les groupes et les points isolés
+# visibles sont envoyés au navigateur, au lieu de toutes les entreprises à chaque rendu.
+def create_map(mask=None, relayout_data=None, store=None):
+    import plotly.graph_objects as go  # Import lourd chargé à la demande
+
+    store = store or get_store()
+    df, _, center_lat, center_lon = load(store)
+    center = {"lat": center_lat, "lon": center_lon}
+    bounds, zoom = geo.viewport(relayout_data, center, 5)
+    view = store.grid().clusters(bounds, zoom, mask)
+
+    points = df.iloc[view.points]
+    fig = go.Figure([
+        go.Scattermapbox(  # Groupes : taille croissante avec le nombre d'entreprises
+            lat=view.cluster_lat,
+            lon=view.cluster_lon,
+            mode="markers+text",
+            marker=dict(size=np.clip(14 + 4 * np.sqrt(view.cluster_count), 14, 50), color="blue", opacity=0.7),
+            text=[str(count) for count in view.cluster_count],
+            textfont=dict(color="white"),
+            hovertext=[f"{count} startups" for count in view.cluster_count],
+            hoverinfo="text",
+        ),
+        go.Scattermapbox(  # Points isolés, avec les détails affichés au survol
+            lat=points["latitude"],
+            lon=points["longitude"],
+            mode="markers",
+            marker=dict(size=14, color="blue", opacity=0.7),
+            hovertext=points["nom"],
+            customdata=points["entreprise_id"],  # Détails chargés au survol par display_hover_image
+            hovertemplate="<b>%{hovertext}</b><extra></extra>",
+        ),
+    ])
 
     fig.update_layout(
     title="Carte des Startups",
     mapbox_style="open-street-map",
     margin={"r": 0, "t": 0, "l": 0, "b": 0},
     dragmode="zoom",  # Permet d'utiliser la molette pour zoomer
+    showlegend=False,
+    uirevision="map",  # Conserve la vue de l'utilisateur quand les points sont recalculés
     mapbox=dict(
         zoom=5,
-        center={"lat": center_lat, "lon": center_lon},
+        center=center,
     )
 )
     return fig
@@ -106,105 +135,155 @@ def create_map(filtered_df=None):
 
 ################################################################################ LAYOUT ################################################################################
 
-layout = html.Div([
-# Hero Section avec image de fond et overlay
-    html.Div([
+def layout():
+    return html.Div([
+    # Hero Section avec image de fond et overlay
+        html.Div([
+            dbc.Container([
+                dbc.Row([
+                    dbc.Col([
+                        html.H1("La carte", className="hero-title mb-4"),
+                        html.H5(
+                            "Retrouvez les startups proches de chez vous.",
+                            className="hero-subtitle mb-4"
+                        ),
+                    ], md=8, lg=8)
+                ], className="min-vh-75 align-items-center")
+            ], fluid=True)
+        ], className="hero-section mb-5"),
+
+            # Section recherche
         dbc.Container([
             dbc.Row([
                 dbc.Col([
-                    html.H1("La carte", className="hero-title mb-4"),
-                    html.H5(
-                        "Retrouvez les startups proches de chez vous.",
-                        className="hero-subtitle mb-4"
-                    ),
-                ], md=8, lg=8)
-            ], className="min-vh-75 align-items-center")
-        ], fluid=True)
-    ], className="hero-section mb-5"),
-
-        # Section recherche
-    dbc.Container([
-        dbc.Row([
-            dbc.Col([
-                dbc.Card([
-                    dbc.CardHeader("Filtres de recherche"),
-                    dbc.CardBody([
-                        dbc.Row([
-                            dbc.Col([
-                                html.Label("Recherche par ville"),
-                                dbc.Input(
-                                    id="location-search",
-                                    type="text",
-                                    placeholder="Entrez une ville",
-                                    className="mb-3"
-                                ),
-                            ], md=6),
-                        
-                            dbc.Col([
-                                html.Label("Recherche par catégorie"),
-                                dcc.Dropdown(
-                                    id='keyword-dropdown',
-                                    options=[{'label': cat, 'value': cat} for cat in unique_categories],
-                                    multi=True,
-                                    placeholder="Sélectionnez une catégorie"
-                                ),
-                            ], md=6),
-                        ]),
-                        dbc.Button("Rechercher", id="search-button", color="primary", className="mt-3"),
-                    ])
-                ], className="mb-4")
-            ], width=12)
-        ])
-    ]),
-
-    # Section carte
-    dbc.Container([
-        dbc.Row([
-            dbc.Col([
-                dbc.Card([
-                    dbc.CardHeader("Carte des Startups"),
-                    dbc.CardBody([
-                        dcc.Graph(id='map-graph', figure=create_map(), style={"height": "600px"}, config={'scrollZoom': True})
+                    dbc.Card([
+                        dbc.CardHeader("Filtres de recherche"),
+                        dbc.CardBody([
+                            dbc.Row([
+                                dbc.Col([
+                                    html.Label("Recherche par ville"),
+                                    dbc.Input(
+                                        id="location-search",
+                                        type="text",
+                                        placeholder="Entrez une ville",
+                                        list="location-suggestions",
+                                        debounce=0.15,  # Suggestions recalculées après une courte pause de frappe
+                                        className="mb-3"
+                                    ),
+                                    html.Datalist(id="location-suggestions"),
+                                ], md=4),
+
+                                dbc.Col([
+                                    html.Label("Rayon (km)"),
+                                    dbc.Input(
+                                        id="radius-search",
+                                        type="number",
+                                        min=1,
+                                        placeholder="Ex. 10",
+                                        disabled=True,  # Activé dès qu'une ville est saisie (suggest_locations)
+                                        className="mb-3"
+                                    ),
+                                ], md=2),
+                            
+                                dbc.Col([
+                                    html.Label("Recherche par catégorie"),
+                                    dcc.Dropdown(
+                                        id='keyword-dropdown',
+                                        options=search_options("Sous-Catégorie"),  # Complétées par search_categories à la saisie
+                                        multi=True,
+                                        placeholder="Sélectionnez une catégorie"
+                                    ),
+                                ], md=6),
+                            ]),
+                            dbc.Button("Rechercher", id="search-button", color="primary", className="mt-3"),
+                            dcc.Store(id="map-filter"),  # Dernier filtre soumis par "Rechercher"
+                        ])
+                    ], className="mb-4")
+                ], width=12)
+            ])
+        ]),
+
+        # Section carte
+        dbc.Container([
+            dbc.Row([
+                dbc.Col([
+                    dbc.Card([
+                        dbc.CardHeader("Carte des Startups"),
+                        dbc.CardBody([
+                            dcc.Graph(id='map-graph', figure=create_map(), style={"height": "600px"}, config={'scrollZoom': True})
+                        ])
                     ])
-                ])
-            ], width=8),
-            dbc.Col([
-                dbc.Card([
-                    dbc.CardHeader("Info startup"),
-                    dbc.CardBody([
-                        html.Div(id="image-container", style={"textAlign": "center"}),
-                        html.Div(id="startup-name", className="text-center mt-3"),
-                        html.Div(id="startup-date", className="text-center"),
-                        html.Div(id="startup-category", className="text-center")
+                ], width=8),
+                dbc.Col([
+                    dbc.Card([
+                        dbc.CardHeader("Info startup"),
+                        dbc.CardBody([
+                            html.Div(id="image-container", style={"textAlign": "center"}),
+                            html.Div(id="startup-name", className="text-center mt-3"),
+                            html.Div(id="startup-date", className="text-center"),
+                            html.Div(id="startup-category", className="text-center")
+                        ])
                     ])
-                ])
-            ], width=4)
-        ], className="mb-5"),
+                ], width=4)
+            ], className="mb-5"),
+        ])
     ])
-])
 
 # Callbacks
+@callback(
+    [Output("location-suggestions", "children"),
+     Output("radius-search", "disabled")],
+    Input("location-search", "value")
+)
+def suggest_locations(location):
+    # Le rayon se mesure autour de la ville : sans ville, le champ est désactivé
+    suggestions = [html.Option(value=suggestion) for suggestion in get_store().location().suggest(location or "")]
+    return suggestions, not location
+
 # State : Ne déclenche pas le callback mais sa valeur est accessible quand le callback est exécuté
 @callback(
-    Output('map-graph', 'figure'),
-    [Input('search-button', 'n_clicks')],
+    [Output('map-graph', 'figure'),
+     Output('map-filter', 'data')],
+    [Input('search-button', 'n_clicks'),
+     Input('map-graph', 'relayoutData')],
     [State('location-search', 'value'),
-    State('keyword-dropdown', 'value')]
+    State('radius-search', 'value'),
+    State('keyword-dropdown', 'value'),
+    State('map-filter', 'data')]
 )
-def update_map(n_clicks, location, selected_keywords):
-    if n_clicks is None:
-        return create_map()
+def update_map(n_clicks, relayout_data, location, radius_km, selected_keywords, submitted):
+    if callback_context.triggered_id == 'map-graph':
+        # Déplacement ou zoom : on recalcule les groupes de la nouvelle vue avec le dernier filtre
+        # soumis, pas avec les champs modifiés depuis ; les autres relayout sont ignorés
+        if not geo.is_viewport_change(relayout_data):
+            raise PreventUpdate
+        return filtered_map(relayout_data, **(submitted or {})), no_update
 
-    filtered_df = df.copy()
+    submitted = {"location": location, "radius_km": radius_km, "selected_keywords": selected_keywords}
+    return filtered_map(relayout_data, **submitted), submitted
 
-    if location:
-        location = location.lower()
-        filtered_df = filtered_df[filtered_df['adresse_def'].str.lower().str.contains(location, na=False)]
+# Carte de la vue courante restreinte à un filtre (ville, rayon, catégories)
+def filtered_map(relayout_data, location=None, radius_km=None, selected_keywords=None):
+    store = get_store()
+    if not (location or selected_keywords):
+        return create_map(relayout_data=relayout_data, store=store)
 
-    if selected_keywords:
-        filtered_df = filtered_df[filtered_df['Sous-Catégorie'].apply(lambda x: any(kw in x for kw in selected_keywords))]
+    df, _, _, _ = load(store)
 
-    return create_map(filtered_df)
+    # Masque sur les lignes de df (mêmes positions que l'index du store), sans copie du DataFrame
+    mask = np.ones(len(df), dtype=bool)
 
+    if location:
+        matches = store.location().search(location)
+        if radius_km and len(matches):
+            # Rayon autour du centre des adresses trouvées (la ville recherchée)
+            rows, _ = store.nearby().within(df['latitude'].iloc[matches].mean(), df['longitude'].iloc[matches].mean(), radius_km)
+            matches = rows
+        location_mask = np.zeros(len(df), dtype=bool)
+        location_mask[matches] = True
+        mask &= location_mask
 
+    if selected_keywords:
+        mask &= store.index("Sous-Catégorie").mask(selected_keywords)
 
+    return create_map(mask, relayout_data, store)
@@ -1,11 +1,7 @@
 import dash
 import pandas as pd
-import missingno as msno
 from dash import html, dcc
 import dash_bootstrap_components as dbc
-from app import get_dataframe 
-
-df= get_dataframe('societes.csv')
 
 ################################################################################ LAYOUT ################################################################################
 
@@ -0,0 +1,62 @@
+# Agrégats du dashboard (cube et agrégats des lignes filtrées) comparés à un calcul pandas
+# direct sur les csv de assets/
+import numpy as np
+import pytest
+
+from app import mean_funding, nbre_startup, pourc_levee, total_funding
+from datastore import Cube, evaluate, filter_key, get_store, summarize
+from datastore.store import read_sources
+
+KEYS = [
+    filter_key(),
+    filter_key(["Cat20"]),
+    filter_key(["Cat20", "Cat33"]),
+    filter_key(year_range=[2010, 2018]),
+    filter_key(effectif=["20 à 49 salariés"]),
+    filter_key(["Cat14"], [2000, 2020], ["1 à 2 salariés", "6 à 9 salariés"]),
+]
+
+
+@pytest.fixture(scope="module")
+def tables():
+    return read_sources()
+
+
+def expected(tables, key):
+    categories, year_range, effectif = key
+    societes, financements = tables["societes.csv"], tables["financements.csv"]
+    mask = np.ones(len(societes), dtype=bool)
+    if categories:
+        tokens = societes["Sous-Catégorie"].fillna("").str.split("|")
+        mask &= tokens.map(lambda values: bool(set(values) & set(categories))).to_numpy()
+    if year_range:
+        mask &= societes["annee_creation"].between(*year_range).to_numpy()
+    if effectif:
+        mask &= societes["Effectif_def"].isin(effectif).to_numpy()
+    rounds = financements[financements["entreprise_id"].isin(societes.loc[mask, "entreprise_id"])]
+    return {
+        "entreprises": int(mask.sum()),
+        "financees": rounds.loc[rounds["Montant_def"] > 0, "entreprise_id"].nunique(),
+        "montant": rounds["Montant_def"].sum(),
+    }
+
+
+@pytest.mark.parametrize("key", KEYS)
+def test_aggregates_match_pandas(tables, key):
+    reference = expected(tables, key)
+    assert reference["entreprises"] > 0
+    store = get_store()
+    slices = [summarize(evaluate(store, key))]
+    if Cube.supports(key):
+        slices.append(store.cube().slice(key))
+    for agg in slices:
+        assert agg.companies["entreprises"].sum() == reference["entreprises"]
+        assert agg.companies["financees"].sum() == reference["financees"]
+        assert agg.rounds["Montant_def"].sum() == pytest.approx(reference["montant"])
+
+        # Les cartes du dashboard partagent la définition d'une entreprise financée
+        mean = reference["montant"] / reference["financees"] if reference["financees"] else 0
+        assert mean_funding(agg) == f"{mean:,.0f} €".replace(",", " ")
+        assert total_funding(agg) == f"{reference['montant']:,.0f} €".replace(",", " ")
+        assert nbre_startup(agg) == f"{reference['entreprises']:,}".replace(",", " ")
+        assert pourc_levee(agg) == f"{reference['financees'] / reference['entreprises'] * 100:.2f}%"
@@ -0,0 +1,100 @@
+# Préchauffage des caches avant que le worker ne reçoive du trafic
+#   python warmup.py [--top N]   (ou STARTHUB_WARMUP=1 au démarrage de l'application)
+#   STARTHUB_PRELOAD=1 prépare les pages dans un thread d'arrière-plan
+#   (avec gunicorn.conf.py, les pages sont préparées dans le processus maître : inutile)
+import argparse
+import threading
+import time
+
+REFRESH_TOP = 10  # Catégories précalculées après un rechargement des données
+
+
+def warmup_states(top=None):
+    # États précalculés : vue par défaut, chaque catégorie seule, chaque taille d'effectif seule
+    from datastore import get_store
+
+    store = get_store()
+    societes = store.table("societes.csv")
+    year_range = [int(societes["annee_creation"].min()), int(societes["annee_creation"].max())]
+
+    # Catégories les plus fréquentes en premier : ce sont les plus demandées
+    counts = store.index("Sous-Catégorie").counts()
+    categories = sorted(counts, key=counts.get, reverse=True)[:top]
+
+    states = [(None, year_range, None)]
+    states += [([category], year_range, None) for category in categories]
+    states += [(None, year_range, [effectif]) for effectif in societes["Effectif_def"].dropna().unique()]
+    return states
+
+
+def warm_up(top=None):
+    start = time.perf_counter()
+    from app import dashboard_entry, results  # Charge les données et les pages
+    import_time = time.perf_counter() - start
+
+    states = warmup_states(top)
+    for categories, year_range, effectif in states:
+        dashboard_entry(categories, year_range, effectif)
+
+    report = {
+        "states": len(states),
+        "import_s": round(import_time, 2),
+        "total_s": round(time.perf_counter() - start, 2),
+        "cache": results.stats(),
+    }
+    print("Préchauffage terminé : {states} états en {total_s}s (chargement {import_s}s)".format(**report), flush=True)
+    return report
+
+
+def preload_pages():
+    # Première visite simulée de chaque page : données, modèles et imports lourds
+    from app import PAGES, home, page_layout
+
+    start = time.perf_counter()
+    for page in [home, *PAGES.values()]:
+        page_layout(page)
+    print(f"Pages préparées en {time.perf_counter() - start:.2f}s", flush=True)
+
+
+def build_recommendations(store):
+    # Table des recommandations de la version, calculée avant de servir : la page d'accueil
+    # ne fait que la relire (sans elle, elle s'affiche sans recommandations)
+    from datastore import recommender
+
+    start = time.perf_counter()
+    _, recomputed = recommender.refresh(store.table("societes.csv"), store.version)
+    print(f"Recommandations prêtes : {recomputed} entreprises recalculées en {time.perf_counter() - start:.2f}s", flush=True)
+
+
+def prepare_shared():
+    # Construit tout ce qui est sinon préparé à la première requête : appelé dans le processus
+    # maître de gunicorn avant le fork, ces objets sont ensuite partagés par tous les workers
+    from datastore import get_store
+
+    store = get_store()
+    store.cube()
+    store.nearby()
+    build_recommendations(store)
+    preload_pages()
+
+
+def refresh_caches(store=None):
+    # Après un rechargement des données : caches et pages de la nouvelle version préparés d'avance
+    from datastore import get_store
+
+    build_recommendations(store or get_store())
+    warm_up(REFRESH_TOP)
+    preload_pages()
+
+
+def start_preload_thread():
+    thread = threading.Thread(target=preload_pages, name="starthub-preload", daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Précalcule les états du dashboard dans le cache de résultats")
+    parser.add_argument("--top", type=int, default=None, help="Nombre de catégories à précalculer (par fréquence)")
+    args = parser.parse_args()
+    print(warm_up(args.top))